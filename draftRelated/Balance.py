@@ -0,0 +1,84 @@
+import numpy as np
+from Catalog import get_catalog, LINES, TYPES
+from Draft import create_draft_pool
+
+DEFAULT_WEIGHTS = {"cost": 1.0, "synergy": 1.0, "faction": 1.0}
+
+
+def generate_pools(units_list, n, draft_size=40, num_gods=4, num_titans=0):
+    '''Draws n candidate pools with create_draft_pool'''
+    return [create_draft_pool(units_list,
+                              draft_size=draft_size,
+                              num_gods=num_gods,
+                              num_titans=num_titans) for i in range(n)]
+
+
+def score_pools(ids, weights=None, synergies=(), catalog=None):
+    '''Scores an (n, width) array of pool unit ids for balance.
+
+    Every component lies in [0, 1], higher is better:
+    cost     - how close the per-type share of spent cost is to the batch
+               average share
+    synergy  - fraction of the given (name, name) synergy pairs present
+    faction  - entropy of the MBP/MBR/MBI spread of the pool
+
+    Returns the weighted total and a dict with each component array.'''
+    catalog = catalog or get_catalog()
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    present = catalog.presence(ids)
+    n = len(ids)
+
+    #Cost distribution per type
+    by_type = np.zeros((len(catalog), len(TYPES)), dtype=np.float32)
+    by_type[np.arange(len(catalog)), catalog.type_code] = catalog.cost
+    type_cost = present @ by_type
+    share = type_cost / np.maximum(type_cost.sum(axis=1, keepdims=True), 1)
+    target = share.mean(axis=0)
+    cost_score = 1 - 0.5 * np.abs(share - target).sum(axis=1)
+
+    #Synergies, any unit of a given name counts
+    synergy_score = np.zeros(n, dtype=np.float32)
+    if synergies:
+        names = {}
+        for unit in catalog.units:
+            names.setdefault(unit.name, []).append(unit.id)
+        for first, second in synergies:
+            synergy_score += (present[:, names[first]].any(axis=1)
+                              & present[:, names[second]].any(axis=1))
+        synergy_score /= len(synergies)
+
+    #Faction spread across game lines
+    by_line = np.zeros((len(catalog), len(LINES)), dtype=np.float32)
+    by_line[np.arange(len(catalog)), catalog.line_code] = 1
+    line_count = present @ by_line
+    p = line_count / np.maximum(line_count.sum(axis=1, keepdims=True), 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropy = -np.where(p > 0, p * np.log(p), 0).sum(axis=1)
+    lines_used = max(int((line_count.sum(axis=0) > 0).sum()), 2)
+    faction_score = entropy / np.log(lines_used)
+
+    scores = {"cost": cost_score,
+              "synergy": synergy_score,
+              "faction": faction_score}
+    total = sum(weights[name] * scores[name] for name in scores)
+    return total, scores
+
+
+def best_pools(units_list,
+               k=1,
+               n_candidates=1000,
+               draft_size=40,
+               num_gods=4,
+               num_titans=0,
+               weights=None,
+               synergies=()):
+    '''Generates n_candidates pools and returns the k best as (score, pool)'''
+    catalog = get_catalog()
+    pools = generate_pools(units_list, n_candidates, draft_size=draft_size,
+                           num_gods=num_gods, num_titans=num_titans)
+    total, scores = score_pools(catalog.pool_ids(pools), weights=weights,
+                                synergies=synergies, catalog=catalog)
+    k = min(k, len(pools))
+    best = np.argpartition(-total, k - 1)[:k]
+    best = best[np.argsort(-total[best])]
+    return [(float(total[idx]), pools[idx]) for idx in best]
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+import Catalog
+import Draft
+import Engine
+import Sampling
+from Catalog import expansion_mask
+from Engine import DraftEngine
+
+
+def _drafter_version():
+    '''Hash of the source of the modules deciding a seeded draft (the
+    engine's seeding, the drafter and its helpers, the urns and the
+    snapshot partitions), so a changed algorithm is a new version
+    wherever the code is installed'''
+    digest = hashlib.sha256()
+    for module in (Engine, Draft, Sampling, Catalog):
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class DraftCache(object):
+    '''Cache of seeded draft results, in memory (LRU) and on disk (SQLite).
+
+    Keys hash the catalog and drafter versions with the parameters, so a
+    change to Units.py or to the drafting code misses every old entry;
+    disk rows of other versions are deleted on open. Unseeded requests
+    are not cacheable and always draft.'''
+    def __init__(self, path=None, maxsize=1024, engine=None):
+        self.engine = engine or DraftEngine()
+        self.catalog = self.engine.catalog
+        self.version = "%s-%s" % (self.catalog.version, _drafter_version())
+        self.maxsize = maxsize
+        self.memory = OrderedDict()
+        self.metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                        "uncached": 0}
+        self._lock = threading.Lock()
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            with self.db:
+                self.db.execute("CREATE TABLE IF NOT EXISTS pools "
+                                "(key TEXT PRIMARY KEY, version TEXT, ids TEXT)")
+                self.db.execute("DELETE FROM pools WHERE version != ?",
+                                (self.version,))
+
+    def key(self, exp_list, draft_size, num_gods, num_titans, seed):
+        if not isinstance(exp_list, int):
+            exp_list = expansion_mask(exp_list)
+        params = [self.version, exp_list, draft_size, num_gods,
+                  num_titans, seed]
+        return hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+    def _remember(self, key, ids):
+        self.memory[key] = ids
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    def _lookup(self, key):
+        with self._lock:
+            ids = self.memory.get(key)
+            if ids is not None:
+                self.memory.move_to_end(key)
+                self.metrics["memory_hits"] += 1
+                return ids
+            if self.db is not None:
+                row = self.db.execute("SELECT ids FROM pools WHERE key = ?",
+                                      (key,)).fetchone()
+                if row is not None:
+                    ids = tuple(json.loads(row[0]))
+                    self._remember(key, ids)
+                    self.metrics["disk_hits"] += 1
+                    return ids
+            self.metrics["misses"] += 1
+        return None
+
+    def _store(self, key, ids):
+        with self._lock:
+            self._remember(key, ids)
+            if self.db is not None:
+                with self.db:
+                    self.db.execute("INSERT OR REPLACE INTO pools VALUES (?, ?, ?)",
+                                    (key, self.version, json.dumps(ids)))
+
+    def draft(self, exp_list, draft_size=40, num_gods=4, num_titans=0,
+              seed=None):
+        '''The pool DraftEngine.draft returns for these parameters'''
+        if seed is None:
+            with self._lock:
+                self.metrics["uncached"] += 1
+            return self.engine.draft(exp_list, draft_size=draft_size,
+                                     num_gods=num_gods, num_titans=num_titans)
+        key = self.key(exp_list, draft_size, num_gods, num_titans, seed)
+        ids = self._lookup(key)
+        if ids is None:
+            pool = self.engine.draft(exp_list, draft_size=draft_size,
+                                     num_gods=num_gods, num_titans=num_titans,
+                                     seed=seed)
+            ids = tuple([unit.id for unit in pool])
+            self._store(key, ids)
+        units = self.catalog.units
+        return [units[unit_id] for unit_id in ids]
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
@@ -0,0 +1,287 @@
+import hashlib
+import threading
+from types import MappingProxyType
+import numpy as np
+from Units import units_init, UnitType, TITAN_MONSTERS, HERO_VARIANTS
+
+#Every expansion known to units_init, grouped by game line
+EXPANSIONS = {"MBP Core": "MBP",
+              "Pandora's Box": "MBP",
+              "Manticore": "MBP",
+              "Oedypos and Sphinx": "MBP",
+              "Dionysus": "MBP",
+              "Poseidon": "MBP",
+              "Hera": "MBP",
+              "Rise of Titans": "MBP",
+              "Hephaistos": "MBP",
+              "Echidna's Children": "MBP",
+              "Heroes of the Trojan War": "MBP",
+              "Ketos": "MBP",
+              "Judges of the Underworld": "MBP",
+              "Corinthia": "MBP",
+              "Keepers of the Soul": "MBP",
+              "Chtonian Wrath": "MBP",
+
+              "MBR Core": "MBR",
+              "Asgard": "MBR",
+              "Ragnar Saga": "MBR",
+              "Surt": "MBR",
+              "Yimir": "MBR",
+              "Nidhogg": "MBR",
+              "Jormungand": "MBR",
+              "Kraken": "MBR",
+
+              "MBI Core": "MBI",
+              "Duat": "MBI",
+              "Eternal Cycle": "MBI",
+              }
+LINES = ("MBP", "MBR", "MBI")
+#Type names indexed by UnitType
+TYPES = tuple([unit_type.name.lower() for unit_type in UnitType])
+
+#Standard expansion sets, snapshotted by Catalog.warm()
+PRESETS = {"MBP Core": ["MBP Core"],
+           "MBR Core": ["MBR Core"],
+           "MBI Core": ["MBI Core"],
+           "Cores": ["MBP Core", "MBR Core", "MBI Core"],
+           "MBP": [exp for exp in EXPANSIONS if EXPANSIONS[exp] == "MBP"],
+           "MBR": [exp for exp in EXPANSIONS if EXPANSIONS[exp] == "MBR"],
+           "MBI": [exp for exp in EXPANSIONS if EXPANSIONS[exp] == "MBI"],
+           "MBP + MBR": [exp for exp in EXPANSIONS
+                         if EXPANSIONS[exp] in ("MBP", "MBR")],
+           "All": list(EXPANSIONS),
+           }
+
+
+def expansion_mask(exp_list):
+    '''Bitmask of the expansions, bit i being the i-th of EXPANSIONS'''
+    mask = 0
+    for bit, expansion in enumerate(EXPANSIONS):
+        if expansion in exp_list:
+            mask |= 1 << bit
+    return mask
+
+
+class Snapshot(object):
+    '''Immutable precomputed view of the catalog for one expansion set,
+    safe to share between threads.
+
+    partitions   - tuple of units per type, indexed by UnitType
+    by_type      - type name -> tuple of units
+    cost_buckets - type -> {cost: tuple of units}
+    exclusions   - unit id -> ids of the units it can't be drafted with
+    ids          - id array of all the units
+
+    Pickles as its mask and is rebuilt from the shared catalog on load.'''
+    def __init__(self, catalog, mask):
+        self.mask = mask
+        self.units = tuple([unit for unit in catalog.units
+                            if mask >> catalog.expansion_bit[unit.expansion] & 1])
+        self.ids = np.array([unit.id for unit in self.units], dtype=np.int32)
+        self.ids.flags.writeable = False
+        #Group the ids by type code in one stable sort
+        codes = catalog.type_code[self.ids]
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(UnitType) + 1))
+        self.partitions = tuple([tuple([catalog.units[unit_id] for unit_id
+                                        in self.ids[order[start:end]]])
+                                 for start, end in zip(bounds[:-1], bounds[1:])])
+        self.by_type = {}
+        self.cost_buckets = {}
+        for unit_type in UnitType:
+            units = self.partitions[unit_type]
+            self.by_type[TYPES[unit_type]] = units
+            buckets = {}
+            for unit in units:
+                buckets.setdefault(unit.cost, []).append(unit)
+            self.cost_buckets[TYPES[unit_type]] = MappingProxyType(
+                {cost: tuple(buckets[cost]) for cost in sorted(buckets)})
+        self.by_type = MappingProxyType(self.by_type)
+        self.cost_buckets = MappingProxyType(self.cost_buckets)
+        members = set(self.ids.tolist())
+        self.exclusions = {}
+        for unit in self.units:
+            excluded = [other for other in catalog.exclusions.get(unit.id, ())
+                        if other in members]
+            if excluded:
+                self.exclusions[unit.id] = tuple(excluded)
+        self.exclusions = MappingProxyType(self.exclusions)
+
+    def __len__(self):
+        return len(self.units)
+
+    def __iter__(self):
+        return iter(self.units)
+
+    def __reduce__(self):
+        return (_snapshot_for_mask, (self.mask,))
+
+
+class Catalog(object):
+    '''All units of every expansion with a stable integer id each.
+
+    Units keep their position in the catalog as `id` and are tagged with
+    their `expansion` and game `line`. Per-unit data is also stored as
+    column arrays indexed by id so pools can be processed in bulk.'''
+    def __init__(self):
+        self.units = []
+        for expansion in EXPANSIONS:
+            for unit in units_init([expansion]):
+                unit.id = len(self.units)
+                unit.expansion = expansion
+                unit.line = EXPANSIONS[expansion]
+                self.units.append(unit)
+        self.units = tuple(self.units)
+        self.expansion_bit = {expansion: bit
+                              for bit, expansion in enumerate(EXPANSIONS)}
+        self.snapshots = {}
+        self._lock = threading.Lock()
+        self.index = {(unit.name, unit.type): unit.id for unit in self.units}
+        self.cost = np.array([unit.cost for unit in self.units],
+                             dtype=np.int16)
+        self.type_code = np.array([unit.type_code for unit in self.units],
+                                  dtype=np.int8)
+        self.line_code = np.array([LINES.index(unit.line)
+                                   for unit in self.units], dtype=np.int8)
+        self.expansion_code = np.array([self.expansion_bit[unit.expansion]
+                                        for unit in self.units], dtype=np.int8)
+        #Missing values count as 0
+        self.strat_val = np.array([unit.strat_val or 0 for unit in self.units],
+                                  dtype=np.int16)
+        self.act_cards = np.array([unit.act_cards or 0 for unit in self.units],
+                                  dtype=np.int16)
+        self.exclusions = self._exclusions()
+        self.version = self._version()
+        #Stats as one float column per stat (nan if missing) and talents as
+        #an inverted index talent -> sorted unit ids
+        stat_names = sorted(set([name for unit in self.units
+                                 for name in unit.stats]))
+        self.stats = {name: np.array([unit.stats.get(name, np.nan)
+                                      for unit in self.units], dtype=np.float64)
+                      for name in stat_names}
+        talents = {}
+        for unit in self.units:
+            for talent in set(unit.talents):
+                talents.setdefault(talent, []).append(unit.id)
+        self.talents = {talent: np.array(ids, dtype=np.int32)
+                        for talent, ids in talents.items()}
+
+    def _version(self):
+        '''Hash of the unit data, changes whenever Units.py does'''
+        digest = hashlib.sha256()
+        for unit in self.units:
+            digest.update(repr((unit.name, unit.type, unit.cost, unit.expansion,
+                                unit.act_cards, unit.strat_val,
+                                sorted(unit.stats.items()),
+                                unit.talents)).encode())
+        return digest.hexdigest()[:16]
+
+    def _exclusions(self):
+        '''unit id -> ids of units that can't share a draft with it'''
+        pairs = []
+        for name in TITAN_MONSTERS:
+            pairs.append([unit.id for unit in self.units if name in unit.name
+                          and unit.type in ("titan", "monster")])
+        for name in HERO_VARIANTS:
+            pairs.append([unit.id for unit in self.units if name in unit.name
+                          and unit.type == "hero"])
+        exclusions = {}
+        for group in pairs:
+            for unit_id in group:
+                exclusions[unit_id] = tuple([other for other in group
+                                             if other != unit_id])
+        return exclusions
+
+    def __len__(self):
+        return len(self.units)
+
+    def units_for(self, exp_list):
+        '''Catalog units of the given expansions, a drop-in for units_init'''
+        return [unit for unit in self.units if unit.expansion in exp_list]
+
+    def snapshot(self, exp_list):
+        '''Snapshot of the expansions, built once per expansion bitmask'''
+        mask = exp_list if isinstance(exp_list, int) else expansion_mask(exp_list)
+        snapshot = self.snapshots.get(mask)
+        if snapshot is None:
+            with self._lock:
+                snapshot = self.snapshots.get(mask)
+                if snapshot is None:
+                    snapshot = Snapshot(self, mask)
+                    self.snapshots[mask] = snapshot
+        return snapshot
+
+    def warm(self, presets=None):
+        '''Builds the snapshots of all (or the given) presets up front'''
+        for exp_list in (presets or PRESETS.values()):
+            self.snapshot(exp_list)
+
+    def find(self,
+             talents=(),
+             unit_type=None,
+             min_cost=None,
+             max_cost=None,
+             stats=None,
+             exp_list=None):
+        '''Ids of the units having all the talents and matching the filters.
+
+        stats maps a stat name to a (low, high) range, either end None for
+        open. e.g. find(talents=["Flying"], max_cost=3)'''
+        if talents:
+            ids = None
+            for talent in talents:
+                posting = self.talents.get(talent, np.zeros(0, dtype=np.int32))
+                ids = posting if ids is None else np.intersect1d(ids, posting)
+        else:
+            ids = np.arange(len(self), dtype=np.int32)
+        keep = np.ones(len(ids), dtype=bool)
+        if unit_type is not None:
+            keep &= self.type_code[ids] == TYPES.index(unit_type)
+        if min_cost is not None:
+            keep &= self.cost[ids] >= min_cost
+        if max_cost is not None:
+            keep &= self.cost[ids] <= max_cost
+        for name, (low, high) in (stats or {}).items():
+            column = self.stats.get(name, np.full(len(self), np.nan))[ids]
+            if low is not None:
+                keep &= column >= low
+            if high is not None:
+                keep &= column <= high
+        if exp_list is not None:
+            keep &= np.isin(ids, self.snapshot(exp_list).ids)
+        return ids[keep]
+
+    def unit_id(self, unit):
+        return self.index[(unit.name, unit.type)]
+
+    def pool_ids(self, pools, width=None):
+        '''Packs pools of units into an (n, width) id array padded with -1'''
+        if width is None:
+            width = max([len(pool) for pool in pools] or [0])
+        ids = np.full((len(pools), width), -1, dtype=np.int32)
+        for row, pool in enumerate(pools):
+            ids[row, :len(pool)] = [self.unit_id(unit) for unit in pool]
+        return ids
+
+    def presence(self, ids):
+        '''Boolean (n, len(catalog)) matrix of which units each pool holds'''
+        present = np.zeros((len(ids), len(self) + 1), dtype=bool)
+        present[np.arange(len(ids))[:, None], ids] = True
+        #Padding (-1) lands in the spare last column
+        return present[:, :-1]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+def get_catalog():
+    '''Returns the shared catalog, building it on first use'''
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog()
+    return _catalog
+
+
+def _snapshot_for_mask(mask):
+    return get_catalog().snapshot(mask)
@@ -0,0 +1,245 @@
+import argparse
+import os
+import queue
+import random
+import threading
+import traceback
+from multiprocessing import Process
+from multiprocessing.connection import Listener, Client
+import numpy as np
+from Catalog import get_catalog
+from Cooccurrence import Cooccurrence
+from Draft import create_draft_pool
+from Jobs import PoolCounts
+from Simulator import DraftStats, POLICIES, simulate_draft
+
+#Environment variable read for the auth key when no flag gives one
+AUTHKEY_ENV = "DRAFT_CLUSTER_AUTHKEY"
+#Longest pool the size histogram counts
+MAX_POOL = 64
+#Failed attempts (errors or lost workers) after which a range is given up
+MAX_ATTEMPTS = 3
+
+
+class Partial(object):
+    '''Mergeable aggregates of a range of simulated drafts'''
+    def __init__(self, num_players=0):
+        num_units = len(get_catalog())
+        self.pools = PoolCounts(num_units)
+        self.sizes = np.zeros(MAX_POOL + 1, dtype=np.int64)
+        self.cooccurrence = Cooccurrence(num_units)
+        self.picks = DraftStats(num_players, num_units) if num_players else None
+
+    def merge(self, other):
+        self.pools.merge(other.pools)
+        self.sizes += other.sizes
+        self.cooccurrence.merge(other.cooccurrence)
+        if self.picks is not None:
+            self.picks.merge(other.picks)
+        return self
+
+
+def run_range(params, start, stop):
+    '''Drafts seeds start..stop-1 and returns their Partial.
+
+    params holds exp_list, draft_size, num_gods, num_titans and optionally
+    policies (POLICIES names, one per seat) to also simulate the picks.
+    Every draft uses random.Random(seed), so results don't depend on how
+    the ranges are split between workers.'''
+    catalog = get_catalog()
+    snapshot = catalog.snapshot(params["exp_list"])
+    policies = [POLICIES[name] for name in params.get("policies", ())]
+    partial = Partial(len(policies))
+    pools = []
+    for seed in range(start, stop):
+        rng = random.Random(seed)
+        try:
+            pool = create_draft_pool(snapshot,
+                                     draft_size=params["draft_size"],
+                                     num_gods=params["num_gods"],
+                                     num_titans=params["num_titans"],
+                                     rng=rng)
+        except ValueError:
+            partial.pools.failures += 1
+            continue
+        ids = [unit.id for unit in pool]
+        partial.pools.update(ids)
+        partial.sizes[min(len(pool), MAX_POOL)] += 1
+        pools.append(pool)
+        if policies:
+            picks = simulate_draft(pool, policies, rng=rng)
+            partial.picks.update(ids, [unit.cost for unit in pool], picks)
+    if pools:
+        partial.cooccurrence.update(catalog.pool_ids(pools))
+    return partial
+
+
+def run_worker(address, authkey):
+    '''Runs seed ranges sent by the coordinator until told to stop.
+
+    A range that raises is reported back as (start, None, traceback).'''
+    connection = Client(address, authkey=authkey)
+    try:
+        while True:
+            task = connection.recv()
+            if task is None:
+                break
+            params, start, stop = task
+            try:
+                partial = run_range(params, start, stop)
+            except Exception:
+                connection.send((start, None, traceback.format_exc()))
+            else:
+                connection.send((start, partial, None))
+    finally:
+        connection.close()
+
+
+class Coordinator(object):
+    '''Hands out seed ranges to connected workers and merges their results.
+
+    A range whose worker fails or disconnects goes back to the queue for
+    another worker; after MAX_ATTEMPTS failures the job is given up and
+    run() raises RuntimeError. Connections carry pickles, so authkey must
+    be a secret shared with the workers only.'''
+    def __init__(self, params, n, authkey, chunk_size=10000,
+                 address=("localhost", 0)):
+        if not authkey:
+            raise ValueError("the coordinator needs an auth key")
+        for name in params.get("policies", ()):
+            if name not in POLICIES:
+                raise ValueError("unknown policy %s" % name)
+        self.params = params
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.tasks = queue.Queue()
+        for start in range(0, n, chunk_size):
+            self.tasks.put((start, min(start + chunk_size, n)))
+        self.remaining = self.tasks.qsize()
+        self.result = Partial(len(params.get("policies", ())))
+        self.attempts = {}
+        self.error = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not self.remaining:
+            self._done.set()
+
+    def _serve(self, connection):
+        try:
+            while not self._done.is_set():
+                try:
+                    start, stop = self.tasks.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                try:
+                    connection.send((self.params, start, stop))
+                    partial, error = connection.recv()[1:]
+                except (EOFError, OSError):
+                    self._failed(start, stop, "worker disconnected")
+                    return
+                if error is not None:
+                    self._failed(start, stop, error)
+                    continue
+                with self._lock:
+                    self.result.merge(partial)
+                    self.remaining -= 1
+                    if not self.remaining:
+                        self._done.set()
+            connection.send(None)
+        except (EOFError, OSError):
+            pass
+        finally:
+            connection.close()
+
+    def _failed(self, start, stop, error):
+        '''Puts the range back, or gives the job up after MAX_ATTEMPTS'''
+        with self._lock:
+            attempts = self.attempts.get(start, 0) + 1
+            self.attempts[start] = attempts
+            if attempts < MAX_ATTEMPTS:
+                self.tasks.put((start, stop))
+            elif self.error is None:
+                self.error = "seeds %d-%d failed %d times:\n%s" % (
+                    start, stop - 1, attempts, error)
+                self._done.set()
+
+    def _accept(self):
+        while not self._done.is_set():
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(connection,),
+                             daemon=True).start()
+
+    def run(self):
+        '''Serves workers until every range is merged; returns the Partial'''
+        threading.Thread(target=self._accept, daemon=True).start()
+        self._done.wait()
+        self.listener.close()
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        return self.result
+
+
+def run_local(params, n, workers=4, chunk_size=10000):
+    '''Coordinator plus worker processes talking over localhost sockets,
+    with a fresh random auth key'''
+    authkey = os.urandom(32)
+    coordinator = Coordinator(params, n, authkey, chunk_size=chunk_size)
+    processes = [Process(target=run_worker,
+                         args=(coordinator.address, authkey))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        return coordinator.run()
+    finally:
+        for process in processes:
+            process.join()
+
+
+def read_authkey(args):
+    '''Auth key from --authkey-file, else the AUTHKEY_ENV variable'''
+    if args.authkey_file:
+        with open(args.authkey_file, "rb") as f:
+            authkey = f.read().strip()
+    else:
+        authkey = os.environ.get(AUTHKEY_ENV, "").encode()
+    if not authkey:
+        raise SystemExit("no auth key: pass --authkey-file or set %s"
+                         % AUTHKEY_ENV)
+    return authkey
+
+
+#MAIN
+if __name__ == "__main__":
+    from Catalog import PRESETS
+    parser = argparse.ArgumentParser(description="Distributed draft simulation")
+    parser.add_argument("role", choices=["coordinator", "worker", "local"])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6000)
+    parser.add_argument("-n", type=int, default=100000)
+    parser.add_argument("--preset", default="All", choices=sorted(PRESETS))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--authkey-file",
+                        help="file holding the secret shared by the "
+                             "coordinator and its workers, else $%s"
+                             % AUTHKEY_ENV)
+    args = parser.parse_args()
+    params = {"exp_list": PRESETS[args.preset],
+              "draft_size": 40,
+              "num_gods": 4,
+              "num_titans": 2,
+              "policies": ["greedy", "greedy"]}
+    if args.role == "worker":
+        run_worker((args.host, args.port), read_authkey(args))
+    else:
+        if args.role == "local":
+            result = run_local(params, args.n, workers=args.workers)
+        else:
+            result = Coordinator(params, args.n, read_authkey(args),
+                                 address=(args.host, args.port)).run()
+        print("%d pools, %d failed, mean seat cost %s"
+              % (result.pools.drafts, result.pools.failures,
+                 result.picks.mean_seat_cost()))
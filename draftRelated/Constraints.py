@@ -0,0 +1,259 @@
+import random
+from collections import namedtuple
+from Catalog import get_catalog, TYPES
+from Units import UnitType
+
+#Between min_count and max_count (None for no limit) units matching the
+#optional type, game line and minimum cost
+Rule = namedtuple("Rule", ["min_count", "max_count", "unit_type", "line",
+                           "min_cost"])
+
+
+def at_least(count, unit_type=None, line=None, min_cost=None):
+    return Rule(count, None, unit_type, line, min_cost)
+
+
+def at_most(count, unit_type=None, line=None, min_cost=None):
+    return Rule(0, count, unit_type, line, min_cost)
+
+
+def _matches(rule, unit):
+    return ((rule.unit_type is None or unit.type == rule.unit_type)
+            and (rule.line is None or unit.line == rule.line)
+            and (rule.min_cost is None or unit.cost >= rule.min_cost))
+
+
+def _covers(wide, narrow):
+    '''True if every unit matching narrow also matches wide'''
+    return ((wide.unit_type is None or wide.unit_type == narrow.unit_type)
+            and (wide.line is None or wide.line == narrow.line)
+            and (wide.min_cost is None or (narrow.min_cost or 0) >= wide.min_cost))
+
+
+def _resolve(snapshot, names):
+    '''Units of the snapshot for names or (name, type) pairs'''
+    units = []
+    for name in names:
+        if isinstance(name, tuple):
+            found = [unit for unit in snapshot
+                     if (unit.name, unit.type) == name]
+        else:
+            found = [unit for unit in snapshot if unit.name == name]
+        if not found:
+            raise ValueError("%s is not in the expansions" % (name,))
+        units.append(found)
+    return units
+
+
+def _prefix_sums(costs, reverse):
+    '''[0, c1, c1 + c2, ...] over the sorted costs'''
+    sums = [0]
+    for cost in sorted(costs, reverse=reverse):
+        sums.append(sums[-1] + cost)
+    return sums
+
+
+class _Search(object):
+    '''Depth first search deciding, unit by unit, whether it is picked.
+
+    Prunes a branch when the remaining units can't complete the cost
+    budget (subset sum reachability per suffix), can't meet a rule
+    (matching units per suffix), can't pay for the units a rule still
+    needs (sum of the cheapest matching costs per suffix, added up over
+    rules of different types) or can't fill the budget without breaking
+    a max_count (most cost the units the capped rules still allow can
+    add, per suffix, with the caps taken together and one by one).'''
+    def __init__(self, candidates, forced, exclusions, rules,
+                 draft_size, max_nodes):
+        self.candidates = candidates
+        self.forced = forced
+        self.exclusions = exclusions
+        self.rules = rules
+        self.draft_size = draft_size
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        n = len(candidates)
+        budget_mask = (1 << (draft_size + 1)) - 1
+        self.costs = [unit.cost if unit.type_code >= UnitType.MONSTER else 0
+                      for unit in candidates]
+        self.reach = [0] * (n + 1)
+        self.reach[n] = 1
+        for i in range(n - 1, -1, -1):
+            self.reach[i] = (self.reach[i + 1]
+                             | self.reach[i + 1] << self.costs[i]) & budget_mask
+        self.matching = [[_matches(rule, unit) for rule in rules]
+                         for unit in candidates]
+        #lowest[i][r]: prefix sums of the costs of the units matching rule
+        #r from i on, cheapest first; its length - 1 is the matching count
+        self.lowest = [None] * (n + 1)
+        rule_costs = [[] for rule in rules]
+        for i in range(n, -1, -1):
+            if i < n:
+                for r, match in enumerate(self.matching[i]):
+                    if match:
+                        rule_costs[r].append(self.costs[i])
+            self.lowest[i] = [_prefix_sums(costs, reverse=False)
+                              for costs in rule_costs]
+        #Budget units each go to the first capped rule they match; at most
+        #max_count - count units of a group can still be picked
+        self.capped = [r for r, rule in enumerate(rules)
+                       if rule.max_count is not None]
+        group = [next((g for g, r in enumerate(self.capped)
+                       if self.matching[i][r] and self.costs[i]), None)
+                 for i in range(n)]
+        #free[i]: cost of the uncapped units from i on, top[i][g]: prefix
+        #sums of the group's costs from i on, most expensive first
+        self.free = [0] * (n + 1)
+        self.total = [0] * (n + 1)
+        self.top = [None] * (n + 1)
+        group_costs = [[] for r in self.capped]
+        for i in range(n, -1, -1):
+            if i < n:
+                self.free[i] = self.free[i + 1]
+                self.total[i] = self.total[i + 1] + self.costs[i]
+                if group[i] is None:
+                    self.free[i] += self.costs[i]
+                else:
+                    group_costs[group[i]].append(self.costs[i])
+            self.top[i] = [_prefix_sums(costs, reverse=True)
+                           for costs in group_costs]
+        self.counts = [0] * len(rules)
+        self.blocked = {}
+        self.picked = []
+
+    def _feasible(self, i, budget):
+        if not self.reach[i] >> budget & 1:
+            return False
+        #Rules of different types need different units, so what the
+        #types need adds up
+        need_by_type = {}
+        for rule, count, lowest in zip(self.rules, self.counts, self.lowest[i]):
+            needed = rule.min_count - count
+            if needed > 0:
+                if needed >= len(lowest) or lowest[needed] > budget:
+                    return False
+                if rule.unit_type is not None:
+                    need_by_type[rule.unit_type] = max(
+                        need_by_type.get(rule.unit_type, 0), lowest[needed])
+            if rule.max_count is not None and count > rule.max_count:
+                return False
+        if sum(need_by_type.values()) > budget:
+            return False
+        most = self.free[i]
+        alone = []
+        for r, sums in zip(self.capped, self.top[i]):
+            allowed = self.rules[r].max_count - self.counts[r]
+            most += sums[min(allowed, len(sums) - 1)]
+            #The cap on its own: all but the cheapest matching units
+            #beyond the allowed ones
+            lowest = self.lowest[i][r]
+            alone.append(self.total[i] - lowest[max(len(lowest) - 1 - allowed, 0)])
+        most = min([most] + alone)
+        return most >= budget
+
+    def run(self):
+        '''True once self.picked is a complete pool. The tree is walked
+        with an explicit stack, deep searches don't recurse.'''
+        n = len(self.candidates)
+        #(position, budget left, whether candidates[position] was picked)
+        stack = [(0, self.draft_size, False)]
+        while stack:
+            i, budget, picked = stack.pop()
+            if picked:
+                #Every pool with candidates[i] failed, try without it
+                self._unpick(i)
+                if self.candidates[i].id not in self.forced:
+                    stack.append((i + 1, budget, False))
+                continue
+            self.nodes += 1
+            if self.nodes > self.max_nodes:
+                raise RuntimeError("search budget of %d nodes exhausted"
+                                   % self.max_nodes)
+            if not self._feasible(i, budget):
+                continue
+            if i == n:
+                return True
+            unit = self.candidates[i]
+            if not self.blocked.get(unit.id) and self.costs[i] <= budget:
+                self._pick(i)
+                stack.append((i, budget, True))
+                stack.append((i + 1, budget - self.costs[i], False))
+            elif unit.id not in self.forced:
+                stack.append((i + 1, budget, False))
+        return False
+
+    def _pick(self, i):
+        unit = self.candidates[i]
+        self.picked.append(unit)
+        self.counts = [count + match for count, match
+                       in zip(self.counts, self.matching[i])]
+        for other in self.exclusions.get(unit.id, ()):
+            self.blocked[other] = self.blocked.get(other, 0) + 1
+
+    def _unpick(self, i):
+        unit = self.picked.pop()
+        self.counts = [count - match for count, match
+                       in zip(self.counts, self.matching[i])]
+        for other in self.exclusions.get(unit.id, ()):
+            self.blocked[other] -= 1
+
+
+def constrained_draft_pool(exp_list,
+                           draft_size=40,
+                           num_gods=4,
+                           num_titans=0,
+                           include=(),
+                           exclude=(),
+                           rules=(),
+                           rng=None,
+                           max_nodes=1000000):
+    '''Random pool obeying the create_draft_pool rules plus constraints.
+
+    include and exclude list unit names, or (name, type) pairs where a
+    name is ambiguous. rules are at_least()/at_most() limits, e.g.
+    at_least(2, "troop", line="MBR"). Candidates are shuffled per call
+    and searched depth first; raises ValueError when no pool satisfies
+    the constraints and RuntimeError after max_nodes search nodes.'''
+    rng = rng or random
+    snapshot = get_catalog().snapshot(exp_list)
+    forced = set()
+    for found in _resolve(snapshot, include):
+        if len(found) > 1:
+            raise ValueError("%s is ambiguous, give (name, type)"
+                             % found[0].name)
+        forced.add(found[0].id)
+    banned = set([unit.id for found in _resolve(snapshot, exclude)
+                  for unit in found])
+    if forced & banned:
+        raise ValueError("a unit is both included and excluded")
+    #Units clashing with an included one can never be picked
+    for unit_id in forced:
+        clashing = set(snapshot.exclusions.get(unit_id, ()))
+        if clashing & forced:
+            raise ValueError("included units can't be drafted together")
+        banned |= clashing
+    #Titans, gods, then monsters, heroes and troops mixed together, each
+    #group shuffled with the forced units first so conflicts surface early
+    partitions = snapshot.partitions
+    candidates = []
+    for units in (partitions[UnitType.TITAN], partitions[UnitType.GOD],
+                  partitions[UnitType.MONSTER] + partitions[UnitType.HERO]
+                  + partitions[UnitType.TROOP]):
+        units = [unit for unit in units if unit.id not in banned]
+        rng.shuffle(units)
+        units.sort(key=lambda unit: unit.id not in forced)
+        candidates.extend(units)
+    rules = [Rule(num_titans, num_titans, "titan", None, None),
+             Rule(num_gods, num_gods, "god", None, None)] + list(rules)
+    for rule in rules:
+        if rule.unit_type is not None and rule.unit_type not in TYPES:
+            raise ValueError("unknown unit type %s" % rule.unit_type)
+        for other in rules:
+            if (other.max_count is not None and _covers(other, rule)
+                    and rule.min_count > other.max_count):
+                raise ValueError("rules %s and %s contradict" % (rule, other))
+    search = _Search(candidates, forced, snapshot.exclusions, rules,
+                     draft_size, max_nodes)
+    if not search.run():
+        raise ValueError("no pool satisfies the constraints")
+    return search.picked
@@ -0,0 +1,73 @@
+import numpy as np
+from Catalog import get_catalog
+
+#Rows per matrix product, about 64 MB of float32 presence for 256 units;
+#float32 counts stay exact below 2**24
+CHUNK = 1 << 16
+
+
+class Cooccurrence(object):
+    '''Unit by unit co-occurrence counts over many pools.
+
+    counts[a, b] is the number of pools holding both catalog units a and
+    b, the diagonal the number of pools holding a. Instances built in
+    separate processes are combined with merge().'''
+    def __init__(self, num_units=None):
+        if num_units is None:
+            num_units = len(get_catalog())
+        self.pools = 0
+        self.counts = np.zeros((num_units, num_units), dtype=np.int64)
+
+    def update(self, ids):
+        '''Adds an (n, width) array of pool unit ids padded with -1'''
+        ids = np.asarray(ids)
+        num_units = len(self.counts)
+        for start in range(0, len(ids), CHUNK):
+            chunk = ids[start:start + CHUNK]
+            present = np.zeros((len(chunk), num_units + 1), dtype=np.float32)
+            present[np.arange(len(chunk))[:, None], chunk] = 1
+            present = present[:, :-1]
+            self.counts += (present.T @ present).astype(np.int64)
+        self.pools += len(ids)
+        return self
+
+    def update_pools(self, pools):
+        '''Adds pools of units as returned by create_draft_pool'''
+        return self.update(get_catalog().pool_ids(pools))
+
+    def merge(self, other):
+        self.pools += other.pools
+        self.counts += other.counts
+        return self
+
+    def marginals(self):
+        return np.diagonal(self.counts)
+
+    def lift(self):
+        '''P(a and b) / (P(a) P(b)), nan for units never seen'''
+        seen = self.marginals().astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.counts * float(self.pools) / np.outer(seen, seen)
+
+    def chi_square(self):
+        '''Pearson chi-square of the 2x2 presence table of every pair'''
+        n = float(self.pools)
+        both = self.counts.astype(np.float64)
+        seen = np.diagonal(both)
+        only_a = seen[:, None] - both
+        only_b = seen[None, :] - both
+        neither = n - seen[:, None] - seen[None, :] + both
+        numerator = n * (both * neither - only_a * only_b) ** 2
+        denominator = (np.outer(seen, n - seen) * np.outer(n - seen, seen))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return numerator / denominator
+
+    def top_pairs(self, k=10, by="lift", min_count=1):
+        '''The k unit pairs (a < b) with the highest lift or chi-square,
+        as (a, b, value) with catalog ids'''
+        values = self.lift() if by == "lift" else self.chi_square()
+        keep = np.triu(self.counts >= min_count, 1) & np.isfinite(values)
+        a, b = np.nonzero(keep)
+        order = np.argsort(-values[a, b])[:k]
+        return [(int(a[i]), int(b[i]), float(values[a[i], b[i]]))
+                for i in order]
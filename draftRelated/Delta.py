@@ -0,0 +1,182 @@
+import numpy as np
+from Catalog import get_catalog
+
+#First byte of every encoding, followed by the 8 byte catalog version
+FORMAT = 1
+
+
+def write_varint(out, value):
+    '''Appends value to the bytearray out, 7 bits per byte (LEB128)'''
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    '''Returns the varint at data[pos] and the position after it'''
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def varint_sizes(values):
+    '''Encoded length in bytes of each value of an array'''
+    values = np.asarray(values, dtype=np.uint64)
+    nbytes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        nbytes += values >= np.uint64(1 << (7 * k))
+    return nbytes
+
+
+def encode_varints(values):
+    '''LEB128 bytes of an array of non-negative integers, vectorized'''
+    values = np.asarray(values, dtype=np.uint64)
+    nbytes = varint_sizes(values)
+    starts = np.cumsum(nbytes) - nbytes
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(int(nbytes.max()) if len(values) else 0):
+        sel = nbytes > k
+        byte = (values[sel] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (nbytes[sel] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[sel] + k] = byte | more
+    return out
+
+
+def decode_varints(data):
+    '''Array of the integers in LEB128 bytes, vectorized'''
+    if not isinstance(data, np.ndarray):
+        data = np.frombuffer(data, dtype=np.uint8)
+    if not len(data):
+        return np.zeros(0, dtype=np.uint64)
+    last = data < 0x80
+    ends = np.nonzero(last)[0]
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    group = np.concatenate(([0], np.cumsum(last[:-1])))
+    shift = (np.arange(len(data)) - starts[group]) * 7
+    parts = (data & 0x7f).astype(np.uint64) << shift.astype(np.uint64)
+    return np.add.reduceat(parts, starts)
+
+
+def write_ids(out, ids):
+    '''Count followed by the gaps between the sorted ids'''
+    ids = sorted(ids)
+    write_varint(out, len(ids))
+    previous = 0
+    for unit_id in ids:
+        write_varint(out, unit_id - previous)
+        previous = unit_id
+
+
+def read_ids(data, pos):
+    count, pos = read_varint(data, pos)
+    ids = []
+    previous = 0
+    for i in range(count):
+        gap, pos = read_varint(data, pos)
+        previous += gap
+        ids.append(previous)
+    return ids, pos
+
+
+def write_header(out):
+    '''Format byte and catalog version; ids are catalog positions, so an
+    encoding only decodes with the catalog it was written with'''
+    out.append(FORMAT)
+    out += bytes.fromhex(get_catalog().version)
+
+
+def read_header(data, pos=0):
+    '''Checks the header at data[pos], returns the position after it'''
+    if len(data) < pos + 9 or data[pos] != FORMAT:
+        raise ValueError("not a pool encoding of format %d" % FORMAT)
+    if bytes(data[pos + 1:pos + 9]).hex() != get_catalog().version:
+        raise ValueError("pools were encoded with another catalog")
+    return pos + 9
+
+
+def _ids(pool):
+    catalog = get_catalog()
+    return set([catalog.unit_id(unit) for unit in pool])
+
+
+def _units(ids):
+    units = get_catalog().units
+    return [units[unit_id] for unit_id in sorted(ids)]
+
+
+def _write_delta(out, base, pool):
+    base_ids = _ids(base)
+    pool_ids = _ids(pool)
+    write_ids(out, base_ids - pool_ids)
+    write_ids(out, pool_ids - base_ids)
+
+
+def _read_delta(base, data, pos):
+    removed, pos = read_ids(data, pos)
+    added, pos = read_ids(data, pos)
+    return _units((_ids(base) - set(removed)) | set(added))
+
+
+def encode_pool(pool):
+    '''Full encoding of a pool of units'''
+    out = bytearray()
+    write_header(out)
+    write_ids(out, _ids(pool))
+    return bytes(out)
+
+
+def decode_pool(data):
+    '''Pool of catalog units, in catalog order'''
+    ids, pos = read_ids(data, read_header(data))
+    return _units(ids)
+
+
+def encode_delta(base, pool):
+    '''Units removed from and added to base to get pool'''
+    out = bytearray()
+    write_header(out)
+    _write_delta(out, base, pool)
+    return bytes(out)
+
+
+def decode_delta(base, data):
+    return _read_delta(base, data, read_header(data))
+
+
+def encode_history(pools):
+    '''The header, then the first pool in full and every later one as a
+    delta to the previous, each record prefixed with its length'''
+    out = bytearray()
+    write_header(out)
+    previous = None
+    for pool in pools:
+        record = bytearray()
+        if previous is None:
+            write_ids(record, _ids(pool))
+        else:
+            _write_delta(record, previous, pool)
+        write_varint(out, len(record))
+        out += record
+        previous = pool
+    return bytes(out)
+
+
+def decode_history(data):
+    pools = []
+    pos = read_header(data)
+    while pos < len(data):
+        length, pos = read_varint(data, pos)
+        record = data[pos:pos + length]
+        pos += length
+        if pools:
+            pools.append(_read_delta(pools[-1], record, 0))
+        else:
+            pools.append(_units(read_ids(record, 0)[0]))
+    return pools
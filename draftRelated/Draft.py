@@ -1,30 +1,76 @@
+import argparse
 import random
-from Units import units_init, Unit
+from contextlib import nullcontext
+from Units import units_init, Unit, UnitType, HERO_VARIANTS
+from Sampling import AliasTables
+from Profile import PhaseTimer, NO_TIMER, profiled
 from prettytable import PrettyTable
+
+def _draw(units, rng):
+    '''Uniform choice from a list, weighted draw from an urn'''
+    if hasattr(units, "draw"):
+        return units.draw(rng)
+    return rng.choice(units)
+
+def _remove_hero_variant(hero, heroes_lists):
+    '''Drops the other version of a hero (Achilles, Heracles, Lagertha)'''
+    for name in HERO_VARIANTS:
+        if name in hero.name:
+            for heroes in heroes_lists:
+                for other in heroes:
+                    if name in other.name:
+                        heroes.remove(other)
+                        break
+            return
+
 def create_draft_pool(units_list, 
                       draft_size=40,
                       num_gods=4,
-                      num_titans=0):
-    titan_list = []
-    gods_list = []
-    monster_list = []
-    heroes_list = []
-    troops_list = []
-    for unit in units_list:
-        if unit.type=="god":
-            gods_list.append(unit)
-        elif unit.type=="monster":
-            monster_list.append(unit)
-        elif unit.type=="hero":
-            heroes_list.append(unit)
-        elif unit.type=="troop":
-            troops_list.append(unit)
-        elif unit.type=="titan":
-            titan_list.append(unit)
+                      num_titans=0,
+                      weights=None,
+                      strata=(),
+                      rng=None,
+                      timer=NO_TIMER):
+    '''Randomly drafts titans, gods and then monsters, heroes and troops
+    until their costs add up to draft_size.
+
+    units_list may also be a Catalog snapshot, which is already partitioned
+    by type. weights maps unit names to draw weights (or is an AliasTables
+    prebuilt over the same units); unlisted units weigh 1. strata is a
+    list of (type, min_cost, count) guarantees for monsters, heroes or
+    troops, e.g. ("monster", 4, 2) for at least two monsters of cost 4 or
+    more. rng defaults to the global random generator. timer gets a lap
+    at the end of each phase, see Profile.PhaseTimer.'''
+    rng = rng or random
+    if weights is not None:
+        if not isinstance(weights, AliasTables):
+            weights = AliasTables(units_list, weights)
+        elif not weights.matches(units_list):
+            raise ValueError("weights were built over other units")
+        titan_list = weights.urn("titan")
+        gods_list = weights.urn("god")
+        monster_list = weights.urn("monster")
+        heroes_list = weights.urn("hero")
+        troops_list = weights.urn("troop")
+    elif hasattr(units_list, "partitions"):
+        #Catalog snapshot, already partitioned
+        (titan_list, gods_list, monster_list,
+         heroes_list, troops_list) = [list(units)
+                                      for units in units_list.partitions]
+    else:
+        partitions = [[] for unit_type in UnitType]
+        for unit in units_list:
+            partitions[unit.type_code].append(unit)
+        (titan_list, gods_list, monster_list,
+         heroes_list, troops_list) = partitions
+    timer.lap("partitioning")
     selected_units = []
     #TITAN SELECTION
     for i in range(num_titans):
-        titan = random.choice(titan_list)
+        try:
+            titan = _draw(titan_list, rng)
+        except IndexError:
+            raise ValueError("not enough titans for the draft")
         selected_units.append(titan)
         titan_list.remove(titan)
         #Special cases handling
@@ -46,15 +92,46 @@ def create_draft_pool(units_list,
                     
     #GODS SELECTION
     for i in range(num_gods):
-        god = random.choice(gods_list)
+        try:
+            god = _draw(gods_list, rng)
+        except IndexError:
+            raise ValueError("not enough gods for the draft")
         selected_units.append(god)
         gods_list.remove(god)
+    timer.lap("titans and gods")
     cur_size=0
+
+    #STRATA, drawn up front from the matching units only so no retries
+    by_type = {"monster": monster_list,
+               "hero": heroes_list,
+               "troop": troops_list}
+    for unit_type, min_cost, count in strata:
+        if unit_type not in by_type:
+            raise ValueError("strata only apply to monsters, heroes and troops")
+        units = by_type[unit_type]
+        candidates = [unit for unit in units if unit.cost >= min_cost]
+        if weights is not None:
+            candidates = weights.sub_urn(candidates)
+        for i in range(count):
+            try:
+                unit = _draw(candidates, rng)
+            except IndexError:
+                raise ValueError("not enough %s units of cost %d or more"
+                                 % (unit_type, min_cost))
+            selected_units.append(unit)
+            cur_size+=unit.cost
+            units.remove(unit)
+            candidates.remove(unit)
+            if unit_type=="hero":
+                _remove_hero_variant(unit, [units, candidates])
+        if cur_size > draft_size:
+            raise ValueError("strata exceed the draft size")
+
     while cur_size != draft_size:
 
         #Monster selection
         try:
-            monster = random.choice(monster_list)        
+            monster = _draw(monster_list, rng)
             if monster.cost+cur_size<= draft_size:
                 selected_units.append(monster)
                 cur_size+=monster.cost
@@ -64,34 +141,20 @@ def create_draft_pool(units_list,
         
         #Heroes selection
         try:
-            hero = random.choice(heroes_list)
+            hero = _draw(heroes_list, rng)
             if hero.cost+cur_size<= draft_size:
                 selected_units.append(hero)
                 cur_size+=hero.cost
             heroes_list.remove(hero)
             #Special cases handling
-            if "Achilles" in hero.name:
-                for hero in heroes_list:
-                    if "Achilles" in hero.name:
-                        heroes_list.remove(hero)
-                        break
-            elif "Heracles" in hero.name:
-                for hero in heroes_list:
-                    if "Heracles" in hero.name:
-                        heroes_list.remove(hero)
-                        break
-            elif "Lagertha" in hero.name:
-                for hero in heroes_list:
-                    if "Lagertha" in hero.name:
-                        heroes_list.remove(hero)
-                        break
+            _remove_hero_variant(hero, [heroes_list])
 
         except IndexError:
             pass #No heroes left for the cost
         
         #Troops selection
         try:
-            troop = random.choice(troops_list)
+            troop = _draw(troops_list, rng)
             if troop.cost+cur_size<= draft_size:
                 selected_units.append(troop)
                 cur_size+=troop.cost
@@ -100,8 +163,33 @@ def create_draft_pool(units_list,
             raise ValueError("not enough units for the draft size")
         
                 
+    timer.lap("budget loop")
     return selected_units
     
+def print_pool(pool):
+    '''Prints the pool as a table with a column per unit type'''
+    #Split units by type for table
+    titans, gods, monsters, heroes, troops = [[] for unit_type in UnitType]
+    columns = [titans, gods, monsters, heroes, troops]
+    for unit in pool:
+        columns[unit.type_code].append(unit)
+
+    #Find out longest list for spacing
+    longest_list = max([len(gods), len(monsters), len(heroes), len(troops)])
+    for i in [titans, gods, monsters, heroes, troops]:
+        while len(i)!= longest_list:
+            #Padding the table with empty unit
+            i.append(Unit(name='', type = '', cost=''))
+    #Display the table
+    t = PrettyTable(['Titans', 'Gods', 'Monsters', "Heroes", "Troops"])
+    for idx in range(longest_list):
+        t.add_row([titans[idx].name,
+                   gods[idx].name, 
+                   monsters[idx].name, 
+                   heroes[idx].name, 
+                   troops[idx].name])
+    print(t)
+
 #MAIN    
 if __name__ == "__main__":
     my_expansions = ["MBP Core", 
@@ -135,43 +223,22 @@ if __name__ == "__main__":
                      "Eternal Cycle",
                      
                      ]
-    units_list = units_init(my_expansions)
-    titans = []
-    gods = []
-    monsters = []
-    heroes = []
-    troops = []
-
-    #Split units by type for table
-    for unit in create_draft_pool(units_list, num_gods=4, num_titans=2):
-        if unit.type=="god":
-            gods.append(unit)
-        elif unit.type=="titan":
-            titans.append(unit)
-        elif unit.type=="monster":
-            monsters.append(unit)
-        elif unit.type=="hero":
-            heroes.append(unit)
-        elif unit.type=="troop":
-            troops.append(unit)
-
-    #Find out longest list for spacing
-    longest_list = max([len(gods), len(monsters), len(heroes), len(troops)])
-    for i in [titans, gods, monsters, heroes, troops]:
-        while len(i)!= longest_list:
-            #Padding the table with empty unit
-            i.append(Unit(name='', type = '', cost=''))
-    #Display the table
-    t = PrettyTable(['Titans', 'Gods', 'Monsters', "Heroes", "Troops"])
-    for idx in range(longest_list):
-        t.add_row([titans[idx].name,
-                   gods[idx].name, 
-                   monsters[idx].name, 
-                   heroes[idx].name, 
-                   troops[idx].name])
-    print(t)
-
-    
-    
-    
-    
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Drafts and prints a pool")
+    parser.add_argument("--count", type=int, default=1,
+                        help="pools to draft, only the last one is printed")
+    parser.add_argument("--profile", metavar="PREFIX",
+                        help="profile the run, writing PREFIX.pstats and "
+                             "PREFIX.folded and printing phase timings")
+    args = parser.parse_args()
+    timer = PhaseTimer() if args.profile else NO_TIMER
+    with profiled(args.profile) if args.profile else nullcontext():
+        timer.start()
+        units_list = units_init(my_expansions)
+        timer.lap("catalog")
+        for i in range(args.count):
+            pool = create_draft_pool(units_list, num_gods=4, num_titans=2,
+                                     timer=timer)
+        print_pool(pool)
+        timer.lap("rendering")
+    if args.profile:
+        print(timer.report())
@@ -0,0 +1,78 @@
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from Catalog import get_catalog, PRESETS
+from Draft import create_draft_pool
+
+
+class DraftEngine(object):
+    '''Reentrant drafting front end for threaded callers.
+
+    Shared data is limited to the catalog and its immutable snapshots;
+    every call drafts on its own copies of the partitions with its own
+    generator: random.Random(seed) for seeded calls, a per-thread
+    generator otherwise. No lock is taken on the drafting path.'''
+    def __init__(self, catalog=None):
+        self.catalog = catalog or get_catalog()
+        self._local = threading.local()
+
+    def _thread_rng(self):
+        rng = getattr(self._local, "rng", None)
+        if rng is None:
+            rng = self._local.rng = random.Random(os.urandom(16))
+        return rng
+
+    def draft(self,
+              exp_list,
+              draft_size=40,
+              num_gods=4,
+              num_titans=0,
+              seed=None,
+              **kwargs):
+        '''create_draft_pool on the expansions' snapshot; extra keyword
+        arguments (weights, strata) are passed through'''
+        if seed is None:
+            rng = self._thread_rng()
+        else:
+            rng = random.Random(seed)
+        return create_draft_pool(self.catalog.snapshot(exp_list),
+                                 draft_size=draft_size,
+                                 num_gods=num_gods,
+                                 num_titans=num_titans,
+                                 rng=rng,
+                                 **kwargs)
+
+
+def stress(n=20000, threads=(1, 2, 4, 8), exp_list=None, num_titans=2):
+    '''Drafts seeds 0..n-1 on thread pools of several sizes.
+
+    Every run must reproduce the single threaded pools exactly; returns
+    {threads: pools per second}.'''
+    engine = DraftEngine()
+    exp_list = exp_list or PRESETS["All"]
+    def job(seed):
+        pool = engine.draft(exp_list, num_titans=num_titans, seed=seed)
+        return [unit.id for unit in pool]
+    expected = [job(seed) for seed in range(n)]
+    throughput = {}
+    for count in threads:
+        with ThreadPoolExecutor(count) as executor:
+            start = time.perf_counter()
+            pools = list(executor.map(job, range(n), chunksize=256))
+            elapsed = time.perf_counter() - start
+        if pools != expected:
+            raise AssertionError("pools differ with %d threads" % count)
+        throughput[count] = n / elapsed
+    return throughput
+
+
+#MAIN
+if __name__ == "__main__":
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print("Python %s, GIL %s" % (sys.version.split()[0],
+                                 "enabled" if gil else "disabled"))
+    for count, rate in stress().items():
+        print("%2d threads: %8.0f pools/s" % (count, rate))
@@ -0,0 +1,152 @@
+import json
+import random
+import sys
+import time
+from hypothesis import given, settings, HealthCheck, strategies as st
+from Catalog import get_catalog, EXPANSIONS
+from Draft import create_draft_pool
+from Validate import validate_pools
+
+#Drafts slower than this are reported, they don't fail the run
+TIME_BUDGET = 0.05
+#Extra alias table tries allowed for weighted drafts, see max_draws
+EXTRA_TRIES = 64
+#Slowest inputs kept as regression benchmarks
+KEEP_SLOWEST = 20
+SLOWEST_PATH = "fuzz_slowest.json"
+
+slowest = []
+
+
+class CountingRandom(random.Random):
+    '''Random that counts the calls to choice(), randrange() and random()'''
+    def __init__(self, seed):
+        super(CountingRandom, self).__init__(seed)
+        self.draws = 0
+
+    def choice(self, seq):
+        self.draws += 1
+        return super(CountingRandom, self).choice(seq)
+
+    def randrange(self, *args):
+        self.draws += 1
+        return super(CountingRandom, self).randrange(*args)
+
+    def random(self):
+        self.draws += 1
+        return super(CountingRandom, self).random()
+
+    def getrandbits(self, k):
+        #Defined so that choice() keeps using getrandbits, not random()
+        return super(CountingRandom, self).getrandbits(k)
+
+
+def max_draws(snapshot, num_gods, num_titans, weights, strata):
+    '''Bound on the generator calls of one draft.
+
+    Every unit draw removes a unit and every budget round but the failing
+    last one removes a troop, so there are at most the titans, gods,
+    strata and three per round of unit draws, one choice() each. A
+    weighted draw is a randrange() and a random() per alias table try;
+    removed items hold under half the table weight, so every try succeeds
+    with probability 1/2 or more and 4 tries per draw plus EXTRA_TRIES
+    are only exceeded with negligible probability.'''
+    draws = (num_titans + num_gods + sum([count for t, c, count in strata])
+             + 3 * (len(snapshot.by_type["troop"]) + 1))
+    if weights is None:
+        return draws
+    return 2 * (4 * draws + EXTRA_TRIES)
+
+
+def run_case(exp_list, draft_size, num_gods, num_titans, seed,
+             weights=None, strata=()):
+    '''Drafts once and checks the result; returns the elapsed time.
+
+    A draft may only fail with ValueError, and may not call the generator
+    more than max_draws times.'''
+    snapshot = get_catalog().snapshot(exp_list)
+    rng = CountingRandom(seed)
+    start = time.perf_counter()
+    try:
+        pool = create_draft_pool(snapshot,
+                                 draft_size=draft_size,
+                                 num_gods=num_gods,
+                                 num_titans=num_titans,
+                                 weights=weights,
+                                 strata=strata,
+                                 rng=rng)
+    except ValueError:
+        pool = None
+    elapsed = time.perf_counter() - start
+    bound = max_draws(snapshot, num_gods, num_titans, weights, strata)
+    assert rng.draws <= bound, "%d draws, bound %d" % (rng.draws, bound)
+    if pool is not None:
+        violations = validate_pools([pool], exp_list, draft_size=draft_size,
+                                    num_gods=num_gods, num_titans=num_titans)
+        assert not violations, violations
+        for unit_type, min_cost, count in strata:
+            matching = [unit for unit in pool
+                        if unit.type == unit_type and unit.cost >= min_cost]
+            assert len(matching) >= count, (unit_type, min_cost, count)
+    return elapsed
+
+
+def _record(elapsed, case):
+    slowest.append((elapsed, case))
+    slowest.sort(key=lambda entry: -entry[0])
+    del slowest[KEEP_SLOWEST:]
+
+
+UNIT_NAMES = sorted(set([unit.name for unit in get_catalog().units]))
+
+cases = st.fixed_dictionaries({
+    "exp_list": st.sets(st.sampled_from(list(EXPANSIONS)),
+                        min_size=1).map(sorted),
+    "draft_size": st.integers(0, 120),
+    "num_gods": st.integers(0, 12),
+    "num_titans": st.integers(0, 6),
+    "seed": st.integers(0, 2 ** 32 - 1),
+    "weights": st.none() | st.dictionaries(st.sampled_from(UNIT_NAMES),
+                                           st.floats(0.1, 10), max_size=30),
+    "strata": st.lists(st.tuples(st.sampled_from(["monster", "hero", "troop"]),
+                                 st.integers(0, 6),
+                                 st.integers(0, 4)), max_size=3)})
+
+
+@settings(max_examples=500,
+          deadline=None,
+          suppress_health_check=[HealthCheck.too_slow])
+@given(case=cases)
+def fuzz_draft(case):
+    _record(run_case(**case), case)
+
+
+def save_slowest(path=SLOWEST_PATH):
+    with open(path, "w") as f:
+        json.dump([case for elapsed, case in slowest], f, indent=1)
+
+
+def rerun_slowest(path=SLOWEST_PATH, repeat=100):
+    '''Benchmarks the recorded cases; returns (mean seconds, case) pairs'''
+    with open(path) as f:
+        cases = json.load(f)
+    results = []
+    for case in cases:
+        total = sum(run_case(**case) for i in range(repeat))
+        results.append((total / repeat, case))
+    return results
+
+
+#MAIN
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--rerun"]:
+        for mean, case in rerun_slowest():
+            print("%.6fs %s" % (mean, case))
+    else:
+        fuzz_draft()
+        save_slowest()
+        print("slowest %.6fs, %d cases saved to %s"
+              % (slowest[0][0], len(slowest), SLOWEST_PATH))
+        for elapsed, case in slowest:
+            if elapsed >= TIME_BUDGET:
+                print("over budget %.6fs %s" % (elapsed, case))
@@ -0,0 +1,112 @@
+import os
+import pickle
+import random
+import numpy as np
+from Catalog import get_catalog
+from Draft import create_draft_pool
+
+
+class PoolCounts(object):
+    '''How often each catalog unit was drafted, plus failed draws'''
+    def __init__(self, num_units):
+        self.drafts = 0
+        self.failures = 0
+        self.counts = np.zeros(num_units, dtype=np.int64)
+
+    def update(self, ids):
+        self.drafts += 1
+        self.counts[ids] += 1
+
+    def merge(self, other):
+        self.drafts += other.drafts
+        self.failures += other.failures
+        self.counts += other.counts
+        return self
+
+
+class SimulationJob(object):
+    '''Long Monte Carlo run over create_draft_pool that survives restarts.
+
+    Every `every` draws the RNG state, the number of draws done and the
+    statistics are written to `path`. A job created on an existing
+    checkpoint with the same parameters continues from it and ends with
+    exactly the result of an uninterrupted run. Checkpoints of another
+    catalog version are rejected, their counts index other units.'''
+    def __init__(self,
+                 path,
+                 exp_list,
+                 n,
+                 draft_size=40,
+                 num_gods=4,
+                 num_titans=0,
+                 seed=0,
+                 every=10000):
+        self.path = path
+        self.every = every
+        catalog = get_catalog()
+        self.params = {"catalog": catalog.version,
+                       "exp_list": sorted(exp_list),
+                       "n": n,
+                       "draft_size": draft_size,
+                       "num_gods": num_gods,
+                       "num_titans": num_titans,
+                       "seed": seed}
+        self.done = 0
+        self.rng = random.Random(seed)
+        self.stats = PoolCounts(len(catalog))
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            state = pickle.load(f)
+        if state["params"].get("catalog") != self.params["catalog"]:
+            raise ValueError("checkpoint %s was written with another catalog"
+                             % self.path)
+        if state["params"] != self.params:
+            raise ValueError("checkpoint %s belongs to another job" % self.path)
+        self.done = state["done"]
+        self.rng.setstate(state["rng_state"])
+        self.stats = state["stats"]
+
+    def checkpoint(self):
+        '''Writes the state next to the checkpoint and swaps it in atomically'''
+        state = {"params": self.params,
+                 "done": self.done,
+                 "rng_state": self.rng.getstate(),
+                 "stats": self.stats}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    @property
+    def finished(self):
+        return self.done >= self.params["n"]
+
+    def run(self, limit=None):
+        '''Draws until the job is finished, or for at most limit draws.
+
+        Returns the statistics gathered so far.'''
+        catalog = get_catalog()
+        snapshot = catalog.snapshot(self.params["exp_list"])
+        stop = self.params["n"]
+        if limit is not None:
+            stop = min(stop, self.done + limit)
+        while self.done < stop:
+            try:
+                pool = create_draft_pool(snapshot,
+                                         draft_size=self.params["draft_size"],
+                                         num_gods=self.params["num_gods"],
+                                         num_titans=self.params["num_titans"],
+                                         rng=self.rng)
+                self.stats.update([unit.id for unit in pool])
+            except ValueError:
+                self.stats.failures += 1
+            self.done += 1
+            if self.done % self.every == 0:
+                self.checkpoint()
+        self.checkpoint()
+        return self.stats
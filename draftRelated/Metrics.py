@@ -0,0 +1,67 @@
+import numpy as np
+from Catalog import get_catalog, EXPANSIONS, LINES, TYPES
+
+#Pools per chunk, bounds the temporary (chunk, width) arrays
+CHUNK = 1 << 18
+
+
+def pool_metrics(ids, catalog=None):
+    '''Summary metrics for an (n, width) array of pool ids padded with -1.
+
+    Returns a dict of arrays with one row per pool:
+    strat_val      - total strategic value
+    act_cards      - total activation cards
+    cost           - total cost of monsters, heroes and troops
+    cost_variance  - (n, len(TYPES)) cost variance per type, nan if none
+    expansions     - number of distinct expansions
+    lines          - (n, len(LINES)) units per game line'''
+    catalog = catalog or get_catalog()
+    ids = np.asarray(ids)
+    n = len(ids)
+    #Padding reads the extra zero entry appended to every column
+    pad = len(catalog)
+    strat_col = np.append(catalog.strat_val, 0).astype(np.int32)
+    act_col = np.append(catalog.act_cards, 0).astype(np.int32)
+    cost_col = np.append(catalog.cost, 0).astype(np.float64)
+    type_col = np.append(catalog.type_code, -1)
+    line_col = np.append(catalog.line_code, -1)
+    exp_col = np.append(catalog.expansion_code, len(EXPANSIONS))
+    budget_types = [TYPES.index(unit_type)
+                    for unit_type in ("monster", "hero", "troop")]
+
+    metrics = {"strat_val": np.zeros(n, dtype=np.int32),
+               "act_cards": np.zeros(n, dtype=np.int32),
+               "cost": np.zeros(n, dtype=np.int32),
+               "cost_variance": np.zeros((n, len(TYPES))),
+               "expansions": np.zeros(n, dtype=np.int32),
+               "lines": np.zeros((n, len(LINES)), dtype=np.int32)}
+    for start in range(0, n, CHUNK):
+        chunk = ids[start:start + CHUNK]
+        rows = slice(start, start + len(chunk))
+        safe = np.where(chunk >= 0, chunk, pad)
+        metrics["strat_val"][rows] = strat_col[safe].sum(axis=1)
+        metrics["act_cards"][rows] = act_col[safe].sum(axis=1)
+
+        cost = cost_col[safe]
+        types = type_col[safe]
+        metrics["cost"][rows] = np.where(np.isin(types, budget_types),
+                                         cost, 0).sum(axis=1)
+        for code in range(len(TYPES)):
+            mask = types == code
+            count = mask.sum(axis=1)
+            total = np.where(mask, cost, 0).sum(axis=1)
+            squares = np.where(mask, cost * cost, 0).sum(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                mean = total / count
+                metrics["cost_variance"][rows, code] = squares / count - mean * mean
+
+        expansions = np.sort(exp_col[safe], axis=1)
+        distinct = 1 + (expansions[:, 1:] != expansions[:, :-1]).sum(axis=1)
+        #The padding code sorts last and is not an expansion
+        distinct -= (expansions[:, -1] == len(EXPANSIONS))
+        metrics["expansions"][rows] = distinct
+
+        lines = line_col[safe]
+        for code in range(len(LINES)):
+            metrics["lines"][rows, code] = (lines == code).sum(axis=1)
+    return metrics
@@ -0,0 +1,235 @@
+import json
+import os
+import numpy as np
+from Catalog import get_catalog
+from Delta import encode_varints, decode_varints, varint_sizes
+
+#Record slots past the end of a pool
+EMPTY = 0xffff
+#Segments are only merged while the result stays under this many records
+MAX_MERGE = 1 << 20
+
+
+class PoolStore(object):
+    '''Append-only on-disk store of pools with a unit -> pool index.
+
+    pools.bin holds fixed-width records of uint16 catalog ids and is read
+    through a memory map. Every append also writes an index segment: for
+    each unit the gap-coded varint list of the records holding it, with a
+    directory of byte offsets per unit. Appends merge the newest segments
+    while their sizes don't shrink geometrically (the timsort run rule),
+    so a store has O(log records) segments plus one per MAX_MERGE / 2
+    records; queries read just the unit's bytes of each segment and keep
+    no file open. meta.json is swapped in last, so a crash mid-append
+    leaves the store as it was before the append.
+    Records are catalog positions, so a store only opens with the catalog
+    version it was created with.'''
+    def __init__(self, path, width=40):
+        self.path = path
+        self.catalog = get_catalog()
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+            if self.meta.get("catalog") != self.catalog.version:
+                raise ValueError("store %s was created with another catalog"
+                                 % path)
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.meta = {"catalog": self.catalog.version, "width": width,
+                         "records": 0, "segments": [], "sizes": [],
+                         "next_segment": 0}
+            self._write_meta()
+        self.width = self.meta["width"]
+        self._records = None
+        self._directories = {}
+
+    def __len__(self):
+        return self.meta["records"]
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _write_meta(self):
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def append(self, pools):
+        '''Adds pools (an id array padded with -1, or pools of units) and
+        returns the record number of the first one'''
+        if not isinstance(pools, np.ndarray):
+            if max([len(pool) for pool in pools] or [0]) > self.width:
+                raise ValueError("pools wider than the store's %d" % self.width)
+            pools = self.catalog.pool_ids(pools, width=self.width)
+        if pools.shape[1] > self.width:
+            raise ValueError("pools wider than the store's %d" % self.width)
+        first = len(self)
+        records = np.full((len(pools), self.width), EMPTY, dtype=np.uint16)
+        records[:, :pools.shape[1]] = np.where(pools >= 0, pools, EMPTY)
+        with open(self._file("pools.bin"), "ab") as f:
+            #Drop any tail left by an append that never committed
+            f.truncate(first * self.width * 2)
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        name = self._next_segment()
+        self._write_segment(name, *self._postings_of(records, first))
+        self.meta["records"] += len(pools)
+        self.meta["segments"].append(name)
+        self.meta["sizes"].append(len(pools))
+        self._write_meta()
+        self._records = None
+        self._merge_tail()
+        return first
+
+    def _next_segment(self):
+        name = "seg%06d" % self.meta["next_segment"]
+        self.meta["next_segment"] += 1
+        return name
+
+    def _postings_of(self, records, first):
+        '''(unit, record number) pairs of the records, sorted by unit'''
+        units = records.ravel()
+        rows = np.repeat(np.arange(first, first + len(records),
+                                   dtype=np.int64), self.width)
+        keep = units != EMPTY
+        units, rows = units[keep], rows[keep]
+        #Stable sort keeps the rows of each unit ascending
+        order = np.argsort(units, kind="stable")
+        return units[order], rows[order]
+
+    def _write_segment(self, name, units, rows):
+        gaps = rows.copy()
+        same = units[1:] == units[:-1]
+        gaps[1:][same] = rows[1:][same] - rows[:-1][same]
+        data = encode_varints(gaps)
+        per_unit = np.bincount(units, weights=varint_sizes(gaps),
+                               minlength=len(self.catalog)).astype(np.int64)
+        directory = np.concatenate(([0], np.cumsum(per_unit)))
+        data.tofile(self._file(name + ".bin"))
+        np.save(self._file(name + ".dir.npy"), directory)
+
+    def _directory(self, name):
+        directory = self._directories.get(name)
+        if directory is None:
+            directory = np.load(self._file(name + ".dir.npy"))
+            self._directories[name] = directory
+        return directory
+
+    def _read_segment(self, name):
+        '''(unit, record number) pairs of a whole segment'''
+        directory = self._directory(name)
+        data = np.fromfile(self._file(name + ".bin"), dtype=np.uint8)
+        gaps = decode_varints(data).astype(np.int64)
+        #Values end on bytes under 0x80; count them per unit
+        ends = np.concatenate(([0], np.cumsum(data < 0x80)))
+        starts = ends[directory[:-1]]
+        counts = ends[directory[1:]] - starts
+        units = np.repeat(np.arange(len(counts)), counts)
+        total = np.cumsum(gaps)
+        before = np.concatenate(([0], total))[starts]
+        return units, total - np.repeat(before, counts)
+
+    def _merge(self, first, last):
+        '''Replaces segments first..last-1 (consecutive, so their record
+        ranges follow each other) by a single one'''
+        old = self.meta["segments"][first:last]
+        parts = [self._read_segment(name) for name in old]
+        units = np.concatenate([part[0] for part in parts])
+        rows = np.concatenate([part[1] for part in parts])
+        order = np.argsort(units, kind="stable")
+        name = self._next_segment()
+        self._write_segment(name, units[order], rows[order])
+        self.meta["segments"][first:last] = [name]
+        self.meta["sizes"][first:last] = [sum(self.meta["sizes"][first:last])]
+        self._write_meta()
+        for segment in old:
+            self._directories.pop(segment, None)
+            os.remove(self._file(segment + ".bin"))
+            os.remove(self._file(segment + ".dir.npy"))
+
+    def _merge_tail(self):
+        '''Merges the newest segments until every size is over the sum of
+        the next two and over the next one. Segments of MAX_MERGE / 2
+        records or more are left alone, so no merge passes MAX_MERGE.'''
+        sizes = self.meta["sizes"]
+        while True:
+            full = [i for i, size in enumerate(sizes) if size >= MAX_MERGE // 2]
+            tail = sizes[full[-1] + 1:] if full else sizes
+            n = len(sizes)
+            if len(tail) > 2 and tail[-3] <= tail[-2] + tail[-1]:
+                pair = n - 3 if tail[-3] < tail[-1] else n - 2
+            elif len(tail) > 1 and tail[-2] <= tail[-1]:
+                pair = n - 2
+            else:
+                return
+            self._merge(pair, pair + 2)
+
+    def postings(self, unit_id):
+        '''Sorted record numbers of the pools holding the unit'''
+        parts = []
+        for name in self.meta["segments"]:
+            directory = self._directory(name)
+            start, stop = directory[unit_id], directory[unit_id + 1]
+            if stop > start:
+                chunk = np.fromfile(self._file(name + ".bin"), dtype=np.uint8,
+                                    count=stop - start, offset=start)
+                parts.append(np.cumsum(decode_varints(chunk)))
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(parts).astype(np.int64)
+
+    def _term_postings(self, term):
+        '''Postings of a catalog id, a unit, or a name (all its units)'''
+        if isinstance(term, str):
+            ids = [unit.id for unit in self.catalog.units if unit.name == term]
+            if not ids:
+                raise ValueError("unknown unit %s" % term)
+        elif isinstance(term, (int, np.integer)):
+            ids = [int(term)]
+        else:
+            ids = [self.catalog.unit_id(term)]
+        return np.unique(np.concatenate([self.postings(unit_id)
+                                         for unit_id in ids]))
+
+    def query(self, *terms):
+        '''Record numbers of the pools holding every term, e.g.
+        query("Surt", "Kraken")'''
+        postings = sorted([self._term_postings(term) for term in terms],
+                          key=len)
+        if not postings:
+            return np.arange(len(self), dtype=np.int64)
+        found = postings[0]
+        for other in postings[1:]:
+            found = np.intersect1d(found, other, assume_unique=True)
+        return found
+
+    def _map(self):
+        if self._records is None:
+            if not len(self):
+                return np.zeros((0, self.width), dtype=np.uint16)
+            self._records = np.memmap(self._file("pools.bin"), dtype=np.uint16,
+                                      mode="r", shape=(len(self), self.width))
+        return self._records
+
+    def records(self, offsets):
+        '''(len(offsets), width) ids of the given records, padded with -1'''
+        rows = self._map()[np.asarray(offsets, dtype=np.int64)]
+        rows = rows.astype(np.int32)
+        rows[rows == EMPTY] = -1
+        return rows
+
+    def pools(self, offsets):
+        '''The given records as lists of catalog units'''
+        units = self.catalog.units
+        return [[units[unit_id] for unit_id in row if unit_id >= 0]
+                for row in self.records(offsets)]
+
+    def compact(self):
+        '''Merges all index segments into a single one'''
+        if len(self.meta["segments"]) > 1:
+            self._merge(0, len(self.meta["segments"]))
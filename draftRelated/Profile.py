@@ -0,0 +1,87 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PhaseTimer(object):
+    '''Adds the wall time since the previous lap to the named phase'''
+    def __init__(self):
+        self.totals = {}
+        self.last = time.perf_counter()
+
+    def start(self):
+        self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.totals[name] = self.totals.get(name, 0.0) + now - self.last
+        self.last = now
+
+    def report(self):
+        total = sum(self.totals.values()) or 1.0
+        return "\n".join(["%-16s %9.4fs %5.1f%%" % (name, seconds,
+                                                     100 * seconds / total)
+                          for name, seconds in self.totals.items()])
+
+
+class _NoTimer(object):
+    def start(self):
+        pass
+
+    def lap(self, name):
+        pass
+
+NO_TIMER = _NoTimer()
+
+
+class StackSampler(threading.Thread):
+    '''Samples the stack of one thread and counts collapsed stacks'''
+    def __init__(self, thread_id, interval=0.001):
+        super(StackSampler, self).__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append("%s:%s" % (os.path.basename(code.co_filename),
+                                        code.co_name))
+                frame = frame.f_back
+            if names:
+                stack = ";".join(reversed(names))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write_folded(self, path):
+        '''One "frame;frame;frame count" line per stack, for flamegraph.pl'''
+        with open(path, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write("%s %d\n" % (stack, count))
+
+
+@contextmanager
+def profiled(prefix):
+    '''Runs the block under cProfile and the stack sampler and writes
+    prefix.pstats and prefix.folded'''
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        sampler.stop()
+        profiler.dump_stats(prefix + ".pstats")
+        sampler.write_folded(prefix + ".folded")
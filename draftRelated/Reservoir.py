@@ -0,0 +1,126 @@
+import queue
+import threading
+from Catalog import expansion_mask, PRESETS
+from Engine import DraftEngine
+
+#Failed drafts in a row after which a preset counts as too small
+MAX_FAILURES = 20
+
+
+class PoolReservoir(object):
+    '''Ready-made pools per expansion preset, refilled in the background.
+
+    Each preset has a bounded queue of up to its quota of pools. When a
+    queue drops under low_watermark the producer threads fill it back to
+    the quota, emptiest preset first. take() pops a ready pool, or drafts
+    synchronously on a miss (empty queue or expansions that aren't a
+    preset). Presets too small for the draft parameters are left empty.'''
+    def __init__(self,
+                 presets=None,
+                 quotas=None,
+                 default_quota=64,
+                 low_watermark=16,
+                 producers=2,
+                 draft_size=40,
+                 num_gods=4,
+                 num_titans=0,
+                 engine=None):
+        self.engine = engine or DraftEngine()
+        self.params = {"draft_size": draft_size,
+                       "num_gods": num_gods,
+                       "num_titans": num_titans}
+        presets = presets or PRESETS
+        quotas = quotas or {}
+        self.low_watermark = low_watermark
+        self.presets = {}
+        self.queues = {}
+        for name, exp_list in presets.items():
+            mask = expansion_mask(exp_list)
+            self.presets[mask] = name
+            self.queues[mask] = queue.Queue(quotas.get(name, default_quota))
+        self.metrics = {"hits": 0, "misses": 0, "produced": 0}
+        #Presets too small for the parameters are never refilled
+        self.infeasible = set()
+        self._failures = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._produce, daemon=True)
+                         for i in range(producers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _count(self, name):
+        with self._lock:
+            self.metrics[name] += 1
+
+    def _neediest(self):
+        '''Mask of the emptiest preset under its low watermark, or None'''
+        needy = [(pool_queue.qsize() / float(pool_queue.maxsize), mask)
+                 for mask, pool_queue in self.queues.items()
+                 if mask not in self.infeasible
+                 and pool_queue.qsize() < min(self.low_watermark,
+                                              pool_queue.maxsize)]
+        return min(needy)[1] if needy else None
+
+    def _produce(self):
+        while not self._stop.is_set():
+            with self._wake:
+                mask = self._neediest()
+                if mask is None:
+                    self._wake.wait(0.5)
+                    continue
+            pool_queue = self.queues[mask]
+            while not pool_queue.full() and not self._stop.is_set():
+                try:
+                    pool = self.engine.draft(mask, **self.params)
+                except ValueError:
+                    #Some draws fail by chance, only give up on a streak
+                    failures = self._failures.get(mask, 0) + 1
+                    self._failures[mask] = failures
+                    if failures >= MAX_FAILURES:
+                        self.infeasible.add(mask)
+                        break
+                    continue
+                self._failures[mask] = 0
+                try:
+                    pool_queue.put_nowait(pool)
+                except queue.Full:
+                    break
+                self._count("produced")
+
+    def take(self, exp_list):
+        '''A pool for the expansions, from the reservoir when possible'''
+        mask = expansion_mask(exp_list)
+        pool_queue = self.queues.get(mask)
+        pool = None
+        if pool_queue is not None:
+            try:
+                pool = pool_queue.get_nowait()
+            except queue.Empty:
+                pass
+            if pool_queue.qsize() < self.low_watermark:
+                with self._wake:
+                    self._wake.notify_all()
+        if pool is not None:
+            self._count("hits")
+            return pool
+        self._count("misses")
+        return self.engine.draft(mask, **self.params)
+
+    def depths(self):
+        '''Ready pools per preset name'''
+        return {self.presets[mask]: pool_queue.qsize()
+                for mask, pool_queue in self.queues.items()}
+
+    def hit_rate(self):
+        with self._lock:
+            total = self.metrics["hits"] + self.metrics["misses"]
+            return self.metrics["hits"] / float(total) if total else 0.0
+
+    def stop(self):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join()
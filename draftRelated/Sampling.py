@@ -0,0 +1,131 @@
+import random
+
+
+class AliasTable(object):
+    '''Walker/Vose alias table, draws an index with O(1) work'''
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("alias table needs a positive total weight")
+        scaled = [weight * n / total for weight in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1
+            if scaled[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+
+    def __len__(self):
+        return len(self.prob)
+
+    def draw(self, rng=random):
+        idx = rng.randrange(len(self.prob))
+        if rng.random() < self.prob[idx]:
+            return idx
+        return self.alias[idx]
+
+
+class WeightedUrn(object):
+    '''Weighted draws without replacement on top of an alias table.
+
+    Removed items are skipped when drawn; once they hold half of the
+    table's weight the table is rebuilt over the remaining items, so draws
+    stay O(1) amortized. Empty urns raise IndexError like random.choice.'''
+    def __init__(self, items, weights, table=None):
+        self.items = list(items)
+        self.weights = list(weights)
+        self.table = table
+        self.removed = set()
+        self.position = {item: i for i, item in enumerate(self.items)}
+        self.live_weight = float(sum(self.weights))
+        if self.table is None and self.live_weight > 0:
+            self.table = AliasTable(self.weights)
+        self.table_weight = self.live_weight
+
+    def __len__(self):
+        return len(self.items) - len(self.removed)
+
+    def __iter__(self):
+        for i, item in enumerate(self.items):
+            if i not in self.removed:
+                yield item
+
+    def draw(self, rng=random):
+        if self.live_weight <= 0:
+            raise IndexError("cannot draw from an empty urn")
+        while True:
+            idx = self.table.draw(rng)
+            if idx not in self.removed:
+                return self.items[idx]
+
+    def remove(self, item):
+        idx = self.position.get(item)
+        if idx is None or idx in self.removed:
+            raise ValueError("item not in urn")
+        self.removed.add(idx)
+        self.live_weight -= self.weights[idx]
+        if self.live_weight < self.table_weight / 2:
+            self._rebuild()
+
+    def _rebuild(self):
+        live = [i for i in range(len(self.items)) if i not in self.removed]
+        self.items = [self.items[i] for i in live]
+        self.weights = [self.weights[i] for i in live]
+        self.removed = set()
+        self.position = {item: i for i, item in enumerate(self.items)}
+        self.live_weight = float(sum(self.weights))
+        self.table_weight = self.live_weight
+        self.table = None
+        if self.live_weight > 0:
+            self.table = AliasTable(self.weights)
+
+
+class AliasTables(object):
+    '''Per-type alias tables over a units list, built once and reused.
+
+    weights maps unit names to weights, units not listed weigh 1. The
+    tables only draw the units they were built over, see matches().'''
+    def __init__(self, units_list, weights):
+        self.weights = dict(weights)
+        self.mask = getattr(units_list, "mask", None)
+        self.units = frozenset([(unit.name, unit.type) for unit in units_list])
+        self.by_type = {}
+        for unit in units_list:
+            self.by_type.setdefault(unit.type, []).append(unit)
+        self.type_weights = {}
+        self.tables = {}
+        for unit_type, units in self.by_type.items():
+            unit_weights = [self.weight(unit) for unit in units]
+            self.type_weights[unit_type] = unit_weights
+            if sum(unit_weights) > 0:
+                self.tables[unit_type] = AliasTable(unit_weights)
+
+    def matches(self, units_list):
+        '''Whether units_list holds the units the tables were built over'''
+        mask = getattr(units_list, "mask", None)
+        if mask is not None and self.mask is not None:
+            return mask == self.mask
+        return frozenset([(unit.name, unit.type)
+                          for unit in units_list]) == self.units
+
+    def weight(self, unit):
+        return self.weights.get(unit.name, 1)
+
+    def urn(self, unit_type):
+        '''Fresh urn over all units of unit_type sharing the precomputed table'''
+        return WeightedUrn(self.by_type.get(unit_type, []),
+                           self.type_weights.get(unit_type, []),
+                           table=self.tables.get(unit_type))
+
+    def sub_urn(self, units):
+        '''Urn over an arbitrary subset, e.g. a stratum'''
+        return WeightedUrn(units, [self.weight(unit) for unit in units])
@@ -0,0 +1,166 @@
+import random
+from multiprocessing import Pool
+import numpy as np
+from Catalog import get_catalog
+from Draft import create_draft_pool
+
+
+def snake_order(num_players, num_picks):
+    '''Seat of every pick: 0 1 2 2 1 0 0 1 2 ...'''
+    order = []
+    forward = list(range(num_players))
+    while len(order) < num_picks:
+        order.extend(forward)
+        forward.reverse()
+    return order[:num_picks]
+
+
+def alternating_order(num_players, num_picks):
+    '''Seat of every pick: 0 1 2 0 1 2 ...'''
+    return [pick % num_players for pick in range(num_picks)]
+
+
+ORDERS = {"snake": snake_order, "alternating": alternating_order}
+
+
+#PICK POLICIES
+#A policy gets the pool, the bitmask of still available pool positions,
+#the positions the seat already picked and an RNG; it returns a position.
+def random_policy(pool, remaining, picked, rng):
+    nth = rng.randrange(remaining.bit_count())
+    for i in range(nth):
+        remaining &= remaining - 1
+    return (remaining & -remaining).bit_length() - 1
+
+
+def greedy_policy(pool, remaining, picked, rng):
+    '''Most expensive unit left'''
+    best = None
+    while remaining:
+        low = remaining & -remaining
+        idx = low.bit_length() - 1
+        if best is None or pool[idx].cost > pool[best].cost:
+            best = idx
+        remaining ^= low
+    return best
+
+
+def heuristic_policy(pool, remaining, picked, rng):
+    '''Most expensive unit of a type the seat has the fewest of'''
+    owned = {}
+    for idx in picked:
+        owned[pool[idx].type] = owned.get(pool[idx].type, 0) + 1
+    best = None
+    while remaining:
+        low = remaining & -remaining
+        idx = low.bit_length() - 1
+        key = (-owned.get(pool[idx].type, 0), pool[idx].cost)
+        if best is None or key > best[0]:
+            best = (key, idx)
+        remaining ^= low
+    return best[1]
+
+
+POLICIES = {"random": random_policy,
+            "greedy": greedy_policy,
+            "heuristic": heuristic_policy}
+
+
+def simulate_draft(pool, policies, order="snake", rng=random):
+    '''Lets len(policies) players pick the whole pool.
+
+    Returns the list of (seat, pool position) in pick order.'''
+    remaining = (1 << len(pool)) - 1
+    picked = [[] for policy in policies]
+    picks = []
+    for seat in ORDERS[order](len(policies), len(pool)):
+        idx = policies[seat](pool, remaining, picked[seat], rng)
+        remaining &= ~(1 << idx)
+        picked[seat].append(idx)
+        picks.append((seat, idx))
+    return picks
+
+
+class DraftStats(object):
+    '''Aggregated outcome of many simulated drafts, mergeable'''
+    def __init__(self, num_players, num_units):
+        self.drafts = 0
+        self.offered = np.zeros(num_units, dtype=np.int64)
+        self.pick_sum = np.zeros(num_units, dtype=np.int64)
+        self.seat_picks = np.zeros((num_players, num_units), dtype=np.int64)
+        self.seat_cost = np.zeros(num_players, dtype=np.int64)
+
+    def update(self, ids, costs, picks):
+        '''Adds one draft given the pool ids, their costs and its picks'''
+        self.drafts += 1
+        self.offered[ids] += 1
+        for rank, (seat, idx) in enumerate(picks):
+            self.pick_sum[ids[idx]] += rank
+            self.seat_picks[seat, ids[idx]] += 1
+            self.seat_cost[seat] += costs[idx]
+
+    def merge(self, other):
+        self.drafts += other.drafts
+        self.offered += other.offered
+        self.pick_sum += other.pick_sum
+        self.seat_picks += other.seat_picks
+        self.seat_cost += other.seat_cost
+        return self
+
+    def mean_pick(self):
+        '''Average pick number per catalog unit, nan if never offered'''
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.pick_sum / self.offered
+
+    def mean_seat_cost(self):
+        return self.seat_cost / max(self.drafts, 1)
+
+
+def _run_chunk(args):
+    (units_list, n, seed, policy_names, order,
+     draft_size, num_gods, num_titans) = args
+    catalog = get_catalog()
+    policies = [POLICIES[name] for name in policy_names]
+    stats = DraftStats(len(policies), len(catalog))
+    rng = random.Random(seed)
+    for i in range(n):
+        pool = create_draft_pool(units_list,
+                                 draft_size=draft_size,
+                                 num_gods=num_gods,
+                                 num_titans=num_titans,
+                                 rng=rng)
+        ids = [catalog.unit_id(unit) for unit in pool]
+        picks = simulate_draft(pool, policies, order=order, rng=rng)
+        stats.update(ids, [unit.cost for unit in pool], picks)
+    return stats
+
+
+def simulate_many(units_list,
+                  n,
+                  policies=("greedy", "greedy"),
+                  order="snake",
+                  draft_size=40,
+                  num_gods=4,
+                  num_titans=0,
+                  seed=0,
+                  processes=None,
+                  chunk_size=1000):
+    '''Simulates n drafts over fresh pools on a process pool.
+
+    policies names one POLICIES entry per seat. Every chunk of drafts gets
+    its own seed derived from seed, so results do not depend on the
+    number of processes.'''
+    chunks = []
+    for start in range(0, n, chunk_size):
+        chunks.append((units_list, min(chunk_size, n - start), seed + start,
+                       tuple(policies), order,
+                       draft_size, num_gods, num_titans))
+    stats = DraftStats(len(policies), len(get_catalog()))
+    if processes == 1:
+        for chunk_stats in map(_run_chunk, chunks):
+            stats.merge(chunk_stats)
+        return stats
+    with Pool(processes) as workers:
+        for chunk_stats in workers.imap_unordered(_run_chunk, chunks):
+            stats.merge(chunk_stats)
+    return stats
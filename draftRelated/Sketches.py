@@ -0,0 +1,291 @@
+import math
+from itertools import combinations
+import numpy as np
+from Catalog import get_catalog, TYPES
+
+MASK64 = np.uint64(0xffffffffffffffff)
+
+
+def mix64(x):
+    '''splitmix64 finalizer over a uint64 array'''
+    x = np.asarray(x, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def _bit_length(x):
+    '''Vectorized int.bit_length() of a uint64 array'''
+    x = x.copy()
+    length = np.zeros(len(x), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= np.uint64(1 << shift)
+        length += shift * high
+        x = np.where(high, x >> np.uint64(shift), x)
+    return length + (x > 0)
+
+
+class HyperLogLog(object):
+    '''Distinct count estimate; relative standard error about `error`'''
+    def __init__(self, error=0.01):
+        self.p = max(4, int(math.ceil(math.log2((1.04 / error) ** 2))))
+        self.registers = np.zeros(1 << self.p, dtype=np.uint8)
+
+    def add(self, hashes):
+        '''Adds an array of uint64 hashes'''
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("sketches have different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = float(len(self.registers))
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+        return estimate
+
+
+class CountMinSketch(object):
+    '''Frequency estimates of integer keys, never under the true count and
+    over it by at most epsilon * total with probability 1 - delta'''
+    def __init__(self, epsilon=1e-4, delta=1e-3, seed=0):
+        self.bits = max(1, int(math.ceil(math.log2(math.e / epsilon))))
+        self.depth = int(math.ceil(math.log(1 / delta)))
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(1, 1 << 63, self.depth,
+                                        dtype=np.uint64) | np.uint64(1)
+        self.table = np.zeros((self.depth, 1 << self.bits), dtype=np.int64)
+        self.total = 0
+
+    def _index(self, row, keys):
+        with np.errstate(over="ignore"):
+            mixed = mix64(keys) * self.multipliers[row]
+        return (mixed >> np.uint64(64 - self.bits)).astype(np.int64)
+
+    def add(self, keys, count=1):
+        keys = np.asarray(keys, dtype=np.uint64)
+        for row in range(self.depth):
+            np.add.at(self.table[row], self._index(row, keys), count)
+        self.total += count * len(keys)
+
+    def add_conservative(self, keys, counts):
+        '''Adds counts[i] to distinct keys[i], raising each counter only
+        to the key's new estimate; much less overestimation than add()'''
+        keys = np.asarray(keys, dtype=np.uint64)
+        counts = np.asarray(counts, dtype=np.int64)
+        indexes = [self._index(row, keys) for row in range(self.depth)]
+        target = np.min([self.table[row, index]
+                         for row, index in enumerate(indexes)], axis=0) + counts
+        for row, index in enumerate(indexes):
+            np.maximum.at(self.table[row], index, target)
+        self.total += int(counts.sum())
+
+    def estimate(self, keys):
+        keys = np.asarray(keys, dtype=np.uint64)
+        return np.min([self.table[row, self._index(row, keys)]
+                       for row in range(self.depth)], axis=0)
+
+    def merge(self, other):
+        if (other.seed, other.table.shape) != (self.seed, self.table.shape):
+            raise ValueError("sketches have different parameters")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+
+class TDigest(object):
+    '''Merging t-digest for quantiles; compression bounds the centroids'''
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self.buffer = []
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values):
+            self.min = min(self.min, values.min())
+            self.max = max(self.max, values.max())
+            self.buffer.append(values)
+            if sum([len(chunk) for chunk in self.buffer]) > 10 * self.compression:
+                self._compress()
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * min(q, 1) - 1)
+
+    def _compress(self, means=None, weights=None):
+        if means is None:
+            means = np.concatenate([self.means] + self.buffer)
+            weights = np.concatenate([self.weights] +
+                                     [np.ones(len(chunk)) for chunk in self.buffer])
+        self.buffer = []
+        if not len(means):
+            return
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        new_means, new_weights = [], []
+        done = 0.0
+        mean, weight = means[0], weights[0]
+        limit = self._k(0) + 1
+        for next_mean, next_weight in zip(means[1:], weights[1:]):
+            if self._k((done + weight + next_weight) / total) <= limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                new_means.append(mean)
+                new_weights.append(weight)
+                done += weight
+                limit = self._k(done / total) + 1
+                mean, weight = next_mean, next_weight
+        new_means.append(mean)
+        new_weights.append(weight)
+        self.means = np.array(new_means)
+        self.weights = np.array(new_weights)
+
+    def merge(self, other):
+        self._compress()
+        other._compress()
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+        return self
+
+    def quantile(self, q):
+        self._compress()
+        if not len(self.means):
+            return math.nan
+        total = self.weights.sum()
+        #Centroid centers on the cumulative weight axis, clamped by min/max
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate(([0], centers, [total]))
+        values = np.concatenate(([self.min], self.means, [self.max]))
+        return float(np.interp(q * total, positions, values))
+
+
+def _combination_keys(ids, size, num_units):
+    '''Keys of every size-combination of units in each padded row'''
+    ids = np.sort(ids, axis=1)
+    columns = np.array(list(combinations(range(ids.shape[1]), size)))
+    parts = ids[:, columns]
+    valid = (parts >= 0).all(axis=2)
+    keys = np.zeros(parts.shape[:2], dtype=np.uint64)
+    for i in range(size):
+        keys = keys * np.uint64(num_units) + np.maximum(parts[:, :, i], 0).astype(np.uint64)
+    return keys[valid]
+
+
+def _split_keys(keys, size, num_units):
+    '''Inverse of _combination_keys: (len(keys), size) unit ids'''
+    ids = np.zeros((len(keys), size), dtype=np.int64)
+    for i in range(size - 1, -1, -1):
+        ids[:, i] = (keys % np.uint64(num_units)).astype(np.int64)
+        keys = keys // np.uint64(num_units)
+    return ids
+
+
+class PoolSketches(object):
+    '''Bounded memory statistics of a stream of pools, mergeable:
+    distinct pools (HyperLogLog), unit pair and triple frequencies
+    (count-min) and per type cost quantiles of the pools (t-digest).
+
+    Combinations are counted with conservative updates, and the
+    `candidates` best of them by estimate are kept as heavy hitter
+    candidates for frequent(). A pool of 24 units has 276 pairs but 2024
+    triples, so the triple sketch gets its own, smaller triple_epsilon;
+    its overestimate is bounded by triple_epsilon times the triples added,
+    and its table takes about 8 * depth * e / triple_epsilon bytes.'''
+    def __init__(self, error=0.01, epsilon=1e-4, delta=1e-3,
+                 compression=100, triples=True, triple_epsilon=1e-5,
+                 candidates=1000, seed=0):
+        self.catalog = get_catalog()
+        self.distinct = HyperLogLog(error)
+        self.pairs = CountMinSketch(epsilon, delta, seed)
+        self.triples = None
+        if triples:
+            self.triples = CountMinSketch(triple_epsilon, delta, seed)
+        self.capacity = candidates
+        self.candidates = {2: np.zeros(0, dtype=np.uint64),
+                           3: np.zeros(0, dtype=np.uint64)}
+        self.costs = {unit_type: TDigest(compression) for unit_type in TYPES}
+        self.pools = 0
+
+    def _sketch(self, size):
+        return self.pairs if size == 2 else self.triples
+
+    def _keep(self, size, keys):
+        '''Keeps the capacity best of the candidates plus keys'''
+        keys = np.union1d(self.candidates[size], keys)
+        if len(keys) > self.capacity:
+            estimates = self._sketch(size).estimate(keys)
+            keys = keys[np.argsort(-estimates, kind="stable")[:self.capacity]]
+        self.candidates[size] = keys
+
+    def _count(self, size, keys):
+        keys, counts = np.unique(keys, return_counts=True)
+        self._sketch(size).add_conservative(keys, counts)
+        #A frequent combination is frequent in most chunks too
+        self._keep(size, keys[np.argsort(-counts, kind="stable")[:self.capacity]])
+
+    def update(self, ids, chunk=1000):
+        '''Adds an (n, width) array of pool ids padded with -1'''
+        ids = np.asarray(ids)
+        num_units = len(self.catalog)
+        cost = np.append(self.catalog.cost, 0)
+        types = np.append(self.catalog.type_code, -1)
+        for start in range(0, len(ids), chunk):
+            rows = np.sort(ids[start:start + chunk], axis=1)
+            safe = np.where(rows >= 0, rows, num_units)
+            signature = np.zeros(len(rows), dtype=np.uint64)
+            with np.errstate(over="ignore"):
+                #Padding leaves the signature as is, so it doesn't depend
+                #on the batch width
+                for column in rows.T:
+                    mixed = mix64(signature * np.uint64(0x100000001b3)
+                                  + np.maximum(column, 0).astype(np.uint64))
+                    signature = np.where(column >= 0, mixed, signature)
+            self.distinct.add(signature)
+            self._count(2, _combination_keys(rows, 2, num_units))
+            if self.triples is not None:
+                self._count(3, _combination_keys(rows, 3, num_units))
+            for code, unit_type in enumerate(TYPES):
+                self.costs[unit_type].add(np.where(types[safe] == code,
+                                                   cost[safe], 0).sum(axis=1))
+            self.pools += len(rows)
+
+    def merge(self, other):
+        self.distinct.merge(other.distinct)
+        self.pairs.merge(other.pairs)
+        self._keep(2, other.candidates[2])
+        if self.triples is not None:
+            self.triples.merge(other.triples)
+            self._keep(3, other.candidates[3])
+        for unit_type in TYPES:
+            self.costs[unit_type].merge(other.costs[unit_type])
+        self.pools += other.pools
+        return self
+
+    def frequent(self, size=2, k=10):
+        '''k most frequent unit pairs (or triples) among the heavy hitter
+        candidates, as (ids, estimated pools)'''
+        keys = self.candidates[size]
+        estimates = self._sketch(size).estimate(keys)
+        best = np.argsort(-estimates, kind="stable")[:k]
+        ids = _split_keys(keys[best], size, len(self.catalog))
+        return [(tuple([int(unit_id) for unit_id in row]), int(estimate))
+                for row, estimate in zip(ids, estimates[best])]
@@ -0,0 +1,102 @@
+import argparse
+import random
+import time
+from itertools import product
+from multiprocessing import Pool
+import numpy as np
+from prettytable import PrettyTable
+from Catalog import get_catalog, PRESETS
+from Draft import create_draft_pool
+
+COLUMNS = ["subset", "draft_size", "num_gods", "num_titans", "feasible",
+           "mean_us", "p95_us", "distinct", "units_used"]
+
+
+def _warm(subsets):
+    '''Builds the snapshots once per worker, every cell then reuses them'''
+    get_catalog().warm(subsets.values())
+
+
+def run_cell(args):
+    '''Drafts n pools for one grid cell and returns its table row:
+    feasible   - share of draws that produced a pool
+    mean_us    - mean time per draw in microseconds, p95_us its 95th pct
+    distinct   - share of the pools that are different from each other
+    units_used - share of the subset's units seen in at least one pool'''
+    subsets, name, draft_size, num_gods, num_titans, n, seed = args
+    snapshot = get_catalog().snapshot(subsets[name])
+    rng = random.Random(seed)
+    times = np.zeros(n)
+    successes = 0
+    pools = set()
+    used = set()
+    for i in range(n):
+        start = time.perf_counter()
+        try:
+            pool = create_draft_pool(snapshot,
+                                     draft_size=draft_size,
+                                     num_gods=num_gods,
+                                     num_titans=num_titans,
+                                     rng=rng)
+        except ValueError:
+            pool = None
+        times[i] = time.perf_counter() - start
+        if pool is not None:
+            successes += 1
+            ids = tuple(sorted([unit.id for unit in pool]))
+            pools.add(ids)
+            used.update(ids)
+    times *= 1e6
+    return {"subset": name,
+            "draft_size": draft_size,
+            "num_gods": num_gods,
+            "num_titans": num_titans,
+            "feasible": successes / float(n),
+            "mean_us": float(times.mean()),
+            "p95_us": float(np.percentile(times, 95)),
+            "distinct": len(pools) / float(successes or 1),
+            "units_used": len(used) / float(len(snapshot) or 1)}
+
+
+def sweep(subsets=None,
+          draft_sizes=(30, 40, 50),
+          num_gods=(2, 4),
+          num_titans=(0, 1, 2),
+          n=1000,
+          seed=0,
+          processes=None):
+    '''Runs every (subset, draft_size, num_gods, num_titans) cell of the
+    grid on a process pool and returns one row per cell, in grid order.
+
+    subsets maps names to expansion lists, PRESETS by default. Each cell
+    draws from its own seed, so rows don't depend on the process count.'''
+    subsets = dict(subsets or PRESETS)
+    cells = [(subsets, name, size, gods, titans, n, seed + index)
+             for index, (name, size, gods, titans) in enumerate(
+                 product(subsets, draft_sizes, num_gods, num_titans))]
+    if processes == 1:
+        _warm(subsets)
+        return [run_cell(cell) for cell in cells]
+    with Pool(processes, initializer=_warm, initargs=(subsets,)) as workers:
+        return workers.map(run_cell, cells)
+
+
+def format_table(rows):
+    table = PrettyTable(COLUMNS)
+    for row in rows:
+        table.add_row([row["subset"], row["draft_size"], row["num_gods"],
+                       row["num_titans"], "%.3f" % row["feasible"],
+                       "%.1f" % row["mean_us"], "%.1f" % row["p95_us"],
+                       "%.3f" % row["distinct"], "%.3f" % row["units_used"]])
+    return table
+
+
+#MAIN
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Draft parameter sweep")
+    parser.add_argument("-n", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+    print(format_table(sweep(n=args.n, seed=args.seed,
+                             processes=args.processes)))
@@ -1,4 +1,17 @@
 
+from enum import IntEnum
+
+class UnitType(IntEnum):
+    '''Integer code of a unit type, in drafting order'''
+    TITAN = 0
+    GOD = 1
+    MONSTER = 2
+    HERO = 3
+    TROOP = 4
+
+#Unit.type string -> UnitType
+UNIT_TYPES = {unit_type.name.lower(): unit_type for unit_type in UnitType}
+
 class Unit(object):
     '''Defines all stats, talents and powers of units'''
     def __init__(self,
@@ -11,6 +24,7 @@ class Unit(object):
                  talents=None):
         self.name = name
         self.type = type
+        self.type_code = UNIT_TYPES.get(type)
         if self.type=="troop":
             self.cost = 1
             self.strat_val = 0
@@ -18,11 +32,17 @@ class Unit(object):
             self.cost = cost
             self.strat_val = strat_val
         self.act_cards = act_cards
-        self.stats = dict()
-        self.talents = list()
+        self.stats = dict(stats or {})
+        self.talents = list(talents or [])
+
+#Units that can't be in the same draft: a titan and its monster version,
+#a hero and its other version
+TITAN_MONSTERS = ("Fenrir", "Ammit", "Kraken")
+HERO_VARIANTS = ("Achilles", "Heracles", "Lagertha")
 
 def units_init(exp_list=None):
     '''Returns the list of units in the game'''
+    exp_list = set(exp_list)
     units_list = []
     if "Eternal Cycle" in exp_list:
         ETERNAL_CYCLE_UNITS = [
@@ -0,0 +1,73 @@
+from collections import namedtuple
+import numpy as np
+from Catalog import get_catalog, TYPES
+
+#pool is the row of the pool in the batch, unit a catalog id or None
+Violation = namedtuple("Violation", ["pool", "rule", "unit", "detail"])
+
+BUDGET_TYPES = [TYPES.index(unit_type)
+                for unit_type in ("monster", "hero", "troop")]
+
+
+def validate_pools(pools,
+                   exp_list,
+                   draft_size=40,
+                   num_gods=4,
+                   num_titans=0):
+    '''Checks pools against the create_draft_pool rules.
+
+    pools is an (n, width) array of catalog ids padded with -1, or a list
+    of pools of units. Returns a list of Violations, empty if all pools
+    are legal. Rules: "unknown unit", "expansion", "duplicate", "gods",
+    "titans", "draft size" and "exclusion".'''
+    catalog = get_catalog()
+    if not isinstance(pools, np.ndarray):
+        pools = catalog.pool_ids(pools)
+    ids = pools.astype(np.int64)
+    filled = ids >= 0
+    violations = []
+
+    unknown = ids >= len(catalog)
+    for row, col in zip(*np.nonzero(unknown)):
+        violations.append(Violation(int(row), "unknown unit", int(ids[row, col]),
+                                    "not a catalog id"))
+    filled &= ~unknown
+    safe = np.where(filled, ids, len(catalog))
+
+    allowed = np.zeros(len(catalog) + 1, dtype=bool)
+    allowed[catalog.snapshot(exp_list).ids] = True
+    for row, col in zip(*np.nonzero(filled & ~allowed[safe])):
+        unit = catalog.units[ids[row, col]]
+        violations.append(Violation(int(row), "expansion", unit.id,
+                                    "%s is from %s" % (unit.name, unit.expansion)))
+
+    ordered = np.sort(safe, axis=1)
+    repeated = (ordered[:, 1:] == ordered[:, :-1]) & (ordered[:, 1:] < len(catalog))
+    for row, col in zip(*np.nonzero(repeated)):
+        unit = catalog.units[ordered[row, col]]
+        violations.append(Violation(int(row), "duplicate", unit.id,
+                                    "%s picked twice" % unit.name))
+
+    type_code = np.append(catalog.type_code, -1)[safe]
+    cost = np.append(catalog.cost, 0)[safe]
+    for rule, code, expected in (("gods", TYPES.index("god"), num_gods),
+                                 ("titans", TYPES.index("titan"), num_titans)):
+        count = (type_code == code).sum(axis=1)
+        for row in np.nonzero(count != expected)[0]:
+            violations.append(Violation(int(row), rule, None,
+                                        "%d instead of %d" % (count[row], expected)))
+    budget = np.where(np.isin(type_code, BUDGET_TYPES), cost, 0).sum(axis=1)
+    for row in np.nonzero(budget != draft_size)[0]:
+        violations.append(Violation(int(row), "draft size", None,
+                                    "%d instead of %d" % (budget[row], draft_size)))
+
+    present = catalog.presence(np.where(filled, ids, -1))
+    for first, others in catalog.exclusions.items():
+        for second in others:
+            if first < second:
+                for row in np.nonzero(present[:, first] & present[:, second])[0]:
+                    violations.append(Violation(
+                        int(row), "exclusion", second, "%s with %s" % (
+                            catalog.units[first].name, catalog.units[second].name)))
+    violations.sort(key=lambda violation: violation.pool)
+    return violations
@@ -0,0 +1,15 @@
+import pickle
+from Catalog import get_catalog, PRESETS
+from Simulator import simulate_many
+
+
+def test_snapshot_pickles_as_the_shared_snapshot():
+    snapshot = get_catalog().snapshot(PRESETS["All"])
+    assert pickle.loads(pickle.dumps(snapshot)) is snapshot
+
+
+def test_simulate_many_takes_a_snapshot_on_a_process_pool():
+    snapshot = get_catalog().snapshot(PRESETS["All"])
+    pooled = simulate_many(snapshot, 40, processes=2, chunk_size=20)
+    local = simulate_many(list(snapshot), 40, processes=1, chunk_size=20)
+    assert (pooled.pick_sum == local.pick_sum).all()
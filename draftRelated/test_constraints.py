@@ -0,0 +1,27 @@
+import random
+import pytest
+from Catalog import PRESETS
+from Constraints import at_least, at_most, constrained_draft_pool
+from Validate import validate_pools
+
+
+def _count(pool, unit_type):
+    return len([unit for unit in pool if unit.type == unit_type])
+
+
+@pytest.mark.parametrize("count, unit_type", [(15, "hero"), (16, "monster")])
+def test_many_units_of_a_type_are_found(count, unit_type):
+    pool = constrained_draft_pool(PRESETS["All"],
+                                  rules=[at_least(count, unit_type)],
+                                  rng=random.Random(0), max_nodes=10000)
+    assert _count(pool, unit_type) >= count
+    assert not validate_pools([pool], PRESETS["All"])
+
+
+@pytest.mark.parametrize("rules, draft_size", [
+    ([at_least(20, "monster")], 40),
+    ([at_most(3, "monster"), at_most(3, "hero"), at_most(3, "troop")], 34)])
+def test_impossible_rules_are_proven_infeasible(rules, draft_size):
+    with pytest.raises(ValueError):
+        constrained_draft_pool(PRESETS["All"], draft_size=draft_size,
+                               rules=rules, max_nodes=10000)
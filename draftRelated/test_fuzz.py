@@ -0,0 +1,16 @@
+from hypothesis import given, settings, HealthCheck
+from Fuzz import cases, run_case
+
+
+@settings(max_examples=200,
+          deadline=None,
+          suppress_health_check=[HealthCheck.too_slow])
+@given(case=cases)
+def test_draft_bounds_and_rules(case):
+    run_case(**case)
+
+
+def test_weighted_strata_draft():
+    run_case(exp_list=["MBP Core", "Pandora's Box"], draft_size=40,
+             num_gods=4, num_titans=0, seed=1,
+             weights={"Zeus": 5.0}, strata=[("monster", 4, 2)])
@@ -0,0 +1,24 @@
+import numpy as np
+import PoolStore
+from PoolStore import PoolStore as Store
+
+
+def test_segments_stay_few_and_queries_match(tmp_path, monkeypatch):
+    monkeypatch.setattr(PoolStore, "MAX_MERGE", 4000)
+    rng = np.random.default_rng(0)
+    store = Store(str(tmp_path), width=20)
+    batches = []
+    for batch in range(200):
+        ids = np.stack([rng.choice(256, 20, replace=False)
+                        for i in range(int(rng.integers(1, 50)))])
+        batches.append(ids)
+        store.append(ids)
+    assert len(store.meta["segments"]) <= 12
+    ids = np.concatenate(batches)
+    for unit_id in (0, 100, 255):
+        expected = np.nonzero((ids == unit_id).any(axis=1))[0]
+        assert (store.postings(unit_id) == expected).all()
+    store.compact()
+    assert len(store.meta["segments"]) == 1
+    expected = np.nonzero((ids == 7).any(axis=1) & (ids == 9).any(axis=1))[0]
+    assert (store.query(7, 9) == expected).all()
@@ -0,0 +1,14 @@
+from Catalog import get_catalog, PRESETS
+from Engine import DraftEngine
+from Sketches import PoolSketches
+
+
+def test_distinct_count_ignores_padding_width():
+    engine = DraftEngine()
+    pools = [engine.draft(PRESETS["All"], seed=seed) for seed in range(500)]
+    sketches = PoolSketches(triples=False)
+    sketches.update(get_catalog().pool_ids(pools))
+    once = sketches.distinct.count()
+    sketches.update(get_catalog().pool_ids(pools, width=40))
+    assert sketches.distinct.count() == once
+    assert abs(once - 500) < 25